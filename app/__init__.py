@@ -4,6 +4,7 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_babel import Babel
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import config
 
@@ -29,6 +30,21 @@ def create_app(config_name='default'):
     # Configure login behavior
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
+    
+    # Trust the X-Forwarded-For entries added by this many proxies (the
+    # login throttle keys on the client address) and the scheme reported
+    # by the nearest one
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=1)
+    
+    # Size the per-process user loader cache, password hashing pool, login
+    # throttle and user metadata write-behind buffer
+    from app.auth.models import user_cache, password_hasher, user_writes
+    from app.auth.throttle import login_throttle
+    user_cache.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+    user_writes.init_app(app)
 
     # Register blueprints
     from app.auth.routes import auth_bp
@@ -46,6 +62,10 @@ def create_app(config_name='default'):
     from app.modules.fitness.routes import fitness_bp
     app.register_blueprint(fitness_bp)
 
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+
     # Configure language handling
     @babel.locale_selector
     def get_locale():
@@ -76,4 +96,5 @@ def create_app(config_name='default'):
 from app.auth.models import User
 from app.modules.health.models import HealthSurvey
 from app.modules.mental.models import MentalWellness
-from app.modules.fitness.models import FitnessMetric
\ No newline at end of file
+from app.modules.fitness.models import FitnessMetric
+from app.core.models import UserDailySummary
\ No newline at end of file
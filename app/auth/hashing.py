@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(RuntimeError):
+    """Raised when no hashing slot frees up within the configured wait."""
+
+
+class PasswordHasher:
+    """Password hashing with configurable cost, run on a bounded thread pool.
+
+    Hashes are computed by `workers` threads, and at most `queue_size`
+    further requests wait for one; beyond that callers wait up to `wait`
+    seconds for a slot and then get HasherBusy. Every caller holds its
+    request thread meanwhile, so `workers + queue_size` should stay below
+    the request threads of a server worker: a burst of logins then holds a
+    fixed number of CPUs and threads and fails fast, leaving the remaining
+    threads to other routes. hashlib's PBKDF2 releases the GIL, so the pool
+    threads run in parallel with each other and with request handling.
+
+    `method` is a werkzeug method string including the work factor, e.g.
+    ``pbkdf2:sha256:600000``; stored hashes with another method are
+    reported by `needs_rehash`.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', salt_length=16,
+                 workers=2, queue_size=1, wait=0.1):
+        self.configure(method, salt_length, workers, queue_size, wait)
+
+    def configure(self, method, salt_length, workers, queue_size, wait):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.queue_size = queue_size
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.configure(app.config['PASSWORD_HASH_METHOD'],
+                       app.config['PASSWORD_HASH_SALT_LENGTH'],
+                       app.config['PASSWORD_HASH_WORKERS'],
+                       app.config['PASSWORD_HASH_QUEUE'],
+                       app.config['PASSWORD_HASH_WAIT'])
+
+    def hash(self, password):
+        """Hash `password` with the configured method."""
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        """Check `password` against a stored hash of any supported method."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other parameters than the configured ones."""
+        method, _, rest = password_hash.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.method or len(salt) != self.salt_length
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.wait):
+            raise HasherBusy()
+        try:
+            return self._pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        # Threads do not survive a fork (e.g. gunicorn --preload): start a
+        # fresh pool in each process
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = _native_executor(self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+
+def _native_executor(workers):
+    # Under gevent's monkey patching, ThreadPoolExecutor threads are
+    # greenlets and a hash would block every request of the worker; gevent's
+    # own executor runs on real threads and waits cooperatively
+    try:
+        from gevent import monkey
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
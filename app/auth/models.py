@@ -1,8 +1,19 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app import db, login_manager
+from app.auth.hashing import PasswordHasher
+from app.utils.cache import TTLCache
+from app.utils.write_behind import WriteBehind
+
+# Per-process identity cache for the Flask-Login user loader, sized from
+# USER_CACHE_SIZE / USER_CACHE_TTL in create_app()
+user_cache = TTLCache()
+
+# Password hashing parameters and thread pool, configured from the
+# PASSWORD_HASH_* settings in create_app()
+password_hasher = PasswordHasher()
 
 class User(UserMixin, db.Model):
     """User model for authentication and profile information."""
@@ -43,16 +54,51 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Set password hash."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Check password against stored hash."""
-        return check_password_hash(self.password_hash, password)
+        """Check password against stored hash.
+        
+        Raises HasherBusy when the hashing pool is saturated.
+        """
+        return password_hasher.verify(self.password_hash, password)
+    
+    @property
+    def password_needs_rehash(self):
+        """Whether the stored hash predates the configured hashing parameters."""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Sign-in times and language toggles, written in batches by a background
+# thread instead of a commit per request; configured in create_app()
+user_writes = WriteBehind(User, ('last_login', 'language_preference'),
+                          on_flush=lambda user_ids: [user_cache.pop(user_id) for user_id in user_ids])
+
 @login_manager.user_loader
 def load_user(user_id):
-    """User loader for Flask-Login."""
-    return User.query.get(int(user_id))
\ No newline at end of file
+    """User loader for Flask-Login.
+
+    Cached users are kept detached and merged into the request session
+    without a query (``load=False``), so a cache hit costs a dict lookup.
+    Routes that modify the user must call `invalidate_user` after commit.
+    Values still buffered in `user_writes` are overlaid on the result.
+    """
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        db.session.expunge(user)
+        user_cache.set(user_id, user)
+    user = db.session.merge(user, load=False)
+    for name, value in user_writes.pending(user_id).items():
+        # As if loaded from the row, so the session does not write it again
+        set_committed_value(user, name, value)
+    return user
+
+def invalidate_user(user_id):
+    """Drop a user from the loader cache after their row changed."""
+    user_cache.pop(user_id)
\ No newline at end of file
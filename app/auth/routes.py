@@ -1,10 +1,13 @@
+import math
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, abort, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_babel import gettext as _
 
 from app import db
-from app.auth.models import User
+from app.auth.hashing import HasherBusy
+from app.auth.models import User, user_cache, user_writes, invalidate_user
+from app.auth.throttle import login_throttle
 from app.auth.forms import (
     LoginForm, RegistrationForm, ProfileForm, 
     ChangePasswordForm, RequestResetForm, ResetPasswordForm
@@ -12,6 +15,12 @@ from app.auth.forms import (
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+@auth_bp.errorhandler(HasherBusy)
+def hasher_busy(e):
+    """Password hashing pool saturated outside of login: ask the client to retry."""
+    db.session.rollback()
+    return _('The server is busy, please try again in a moment.'), 503, {'Retry-After': '1'}
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """User registration page."""
@@ -46,13 +55,35 @@ def login():
         else:
             user = User.query.filter_by(username=form.username.data).first()
         
-        if user is None or not user.check_password(form.password.data):
+        # Refuse floods before they cost a password hash
+        wait = login_throttle.check(request.remote_addr, user, form.username.data)
+        if wait:
+            flash(_('Too many sign-in attempts, please try again later.'), 'warning')
+            return render_template('auth/login.html', title=_('Login'), form=form), 429, \
+                {'Retry-After': str(math.ceil(wait))}
+        
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+            # Upgrade hashes made with older parameters while the password is at hand
+            rehash = valid and user.password_needs_rehash
+            if rehash:
+                user.set_password(form.password.data)
+        except HasherBusy:
+            flash(_('Too many sign-ins right now, please try again in a moment.'), 'warning')
+            return render_template('auth/login.html', title=_('Login'), form=form), 503, \
+                {'Retry-After': '1'}
+        
+        if not valid:
+            login_throttle.failed(user, form.username.data)
             flash(_('Invalid username or password'), 'danger')
             return redirect(url_for('auth.login'))
         
-        # Update last login time
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        if rehash:
+            db.session.commit()
+            invalidate_user(user.id)
+        
+        # Record the login time in the next batched write, off the request path
+        user_writes.set(user.id, last_login=datetime.utcnow())
         
         # Login the user
         login_user(user, remember=form.remember_me.data)
@@ -116,8 +147,11 @@ def profile():
         if form.language_preference.data != current_user.language_preference:
             current_user.language_preference = form.language_preference.data
             session['language'] = form.language_preference.data
+            # Saved now: a buffered toggle must not overwrite it later
+            user_writes.discard(current_user.id, 'language_preference')
         
         db.session.commit()
+        invalidate_user(current_user.id)
         flash(_('Your profile has been updated.'), 'success')
         return redirect(url_for('auth.profile'))
     
@@ -136,6 +170,7 @@ def change_password():
         
         current_user.set_password(form.new_password.data)
         db.session.commit()
+        invalidate_user(current_user.id)
         flash(_('Your password has been updated.'), 'success')
         return redirect(url_for('auth.profile'))
     
@@ -175,4 +210,12 @@ def reset_password(token):
         flash(_('Your password has been reset. You can now log in.'), 'success')
         return redirect(url_for('auth.login'))
     
-    return render_template('auth/reset_password.html', title=_('Reset Password'), form=form)
\ No newline at end of file
+    return render_template('auth/reset_password.html', title=_('Reset Password'), form=form)
+
+@auth_bp.route('/cache_stats')
+@login_required
+def cache_stats():
+    """User loader cache counters for this worker process (admins only)."""
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(user_cache.stats())
\ No newline at end of file
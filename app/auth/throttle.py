@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryStore:
+    """Token buckets kept in the worker process.
+
+    Each gunicorn worker counts attempts on its own, so the effective limit
+    is multiplied by the number of workers. At most `maxsize` buckets are
+    kept; the least recently used one is dropped first, which only gives
+    its key a full bucket again.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period, take=True):
+        """Take a token from bucket `key`, which refills `capacity` tokens per `period` seconds.
+
+        Returns 0 when a token was taken, otherwise the seconds until one
+        is available. With `take` false the bucket is only checked.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _take(tokens, now - updated, capacity, period, take)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class KeyValueStore:
+    """Token buckets kept in a key-value store shared by all workers.
+
+    `client` needs ``get(key)`` and ``set(key, value, ex=seconds)``, the
+    subset of the redis-py API used here; LocalKeyValue provides it in
+    process. A bucket expires once it would be full again, so idle keys
+    cost nothing. Reads and writes are not atomic across processes:
+    concurrent attempts may let a few more through than the limit, which
+    is acceptable for throttling.
+    """
+
+    def __init__(self, client, prefix='login-throttle:'):
+        self.client = client
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period, take=True):
+        """Take a token from bucket `key`; see MemoryStore.consume."""
+        key = self.prefix + key
+        now = time.time()
+        with self._lock:
+            stored = self.client.get(key)
+            if stored is None:
+                tokens, updated = capacity, now
+            else:
+                if isinstance(stored, bytes):
+                    stored = stored.decode()
+                tokens, updated = map(float, stored.split(':'))
+            tokens, wait = _take(tokens, now - updated, capacity, period, take)
+            self.client.set(key, f'{tokens}:{now}', ex=max(1, int(period)))
+        return wait
+
+
+class LocalKeyValue:
+    """In-process stand-in for a shared key-value store, with expiring keys.
+
+    Keys are kept in the order they were last written. Each write drops
+    the expired keys at the front and, beyond `maxsize` keys, the least
+    recently written ones, so keys that are never read again do not
+    accumulate.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._data.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value, ex=None):
+        now = time.monotonic()
+        expires = now + ex if ex else float('inf')
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > 1:
+                oldest = next(iter(self._data))
+                if self._data[oldest][0] > now and len(self._data) <= self.maxsize:
+                    break
+                del self._data[oldest]
+
+
+def _take(tokens, elapsed, capacity, period, take=True):
+    tokens = min(capacity, tokens + max(elapsed, 0) * capacity / period)
+    if tokens >= 1:
+        return tokens - take, 0
+    return tokens, (1 - tokens) * period / capacity
+
+
+class LoginThrottle:
+    """Token-bucket limits on sign-in attempts per client address and per account.
+
+    Checked before the password hash is verified, so a rejected attempt
+    costs a dictionary or key-value lookup instead of a hash computation.
+    Every attempt counts against its address; only failed password checks
+    count against the account, so signing in successfully never locks its
+    owner out. Limits are ``(attempts, seconds)`` pairs: bursts of up to
+    `attempts`, refilled at that many per `seconds`.
+    """
+
+    STORES = {
+        'memory': MemoryStore,
+        'local': lambda: KeyValueStore(LocalKeyValue()),
+    }
+
+    def __init__(self, per_ip=(20, 60), per_account=(5, 300), store=None, enabled=True):
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.store = store or MemoryStore()
+        self.enabled = enabled
+
+    def init_app(self, app, store=None):
+        """Read the LOGIN_THROTTLE_* settings; `store` overrides the configured one."""
+        self.enabled = app.config['LOGIN_THROTTLE_ENABLED']
+        self.per_ip = app.config['LOGIN_THROTTLE_PER_IP']
+        self.per_account = app.config['LOGIN_THROTTLE_PER_ACCOUNT']
+        self.store = store or self.STORES[app.config['LOGIN_THROTTLE_STORE']]()
+
+    def check(self, address, user, name):
+        """Count an attempt; returns 0 if it may proceed, else seconds to wait.
+
+        `user` is the account the typed `name` resolved to, or None.
+        """
+        if not self.enabled:
+            return 0
+        wait = self.store.consume(f'ip:{address}', *self.per_ip)
+        if wait:
+            return wait
+        return self.store.consume(self._account_key(user, name), *self.per_account, take=False)
+
+    def failed(self, user, name):
+        """Count a failed password check against the account; see `check`."""
+        if self.enabled:
+            self.store.consume(self._account_key(user, name), *self.per_account)
+
+    @staticmethod
+    def _account_key(user, name):
+        # One bucket per account whether it is named by username or email
+        if user is not None:
+            return f'user:{user.id}'
+        return f'name:{name.strip().lower()}'
+
+
+# Configured from the LOGIN_THROTTLE_* settings in create_app()
+login_throttle = LoginThrottle()
@@ -0,0 +1,147 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from app import db
+from app.auth.models import User
+from app.core import upgrades
+from app.core.importer import TARGETS, guess_format, import_file
+from app.core.insights import refresh_all
+from app.modules.health import medications
+from app.modules.health.vitals import rebuild_baselines
+from app.modules.mental.therapy import due_follow_ups
+
+
+@click.command('import')
+@click.argument('target', type=click.Choice(sorted(TARGETS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'username', required=True, help='Username or email of the owner.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format, guessed from the extension by default.')
+@with_appcontext
+def import_command(target, path, username, file_format):
+    """Bulk import daily fitness or health records from a CSV or JSONL file."""
+    user = User.query.filter((User.username == username) | (User.email == username)).first()
+    if user is None:
+        raise click.BadParameter(f'No user named {username}', param_hint='--user')
+
+    file_format = file_format or guess_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        report = import_file(user.id, target, stream, file_format)
+    db.session.commit()
+
+    click.echo(f'Imported {report.rows_imported} of {report.rows_read} rows into {target} '
+               f'in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)')
+    if report.ignored_columns:
+        click.echo(f"Ignored columns: {', '.join(report.ignored_columns)}")
+    if report.rows_rejected:
+        click.echo(f'Rejected {report.rows_rejected} rows:')
+        for line, message in report.errors:
+            click.echo(f'  line {line}: {message}')
+
+
+@click.group('insights')
+def insights():
+    """Precompute cross-module insights."""
+
+
+@insights.command('refresh')
+@click.option('--workers', type=int, help='Worker processes (default: one per CPU).')
+@with_appcontext
+def refresh_insights_command(workers):
+    """Recompute missing and stale insights for all active users."""
+    start = time.perf_counter()
+    count = refresh_all(workers, os.environ.get('FLASK_ENV', 'default'))
+    click.echo(f'Refreshed insights of {count} users in {time.perf_counter() - start:.1f}s')
+
+
+@click.group('reminders')
+def reminders():
+    """Find what users should be reminded of, for a scheduler to run periodically."""
+
+
+@reminders.command('doses')
+@click.option('--window', default=15, show_default=True,
+              help='Minutes around now in which a pending dose counts as due.')
+@with_appcontext
+def due_doses_command(window):
+    """List medication doses due now across all users.
+
+    Also generates upcoming dose slots and resolves overdue doses as missed,
+    so running this regularly keeps every schedule and adherence rate current.
+    """
+    now = datetime.utcnow()
+    medications.extend_schedules(now)
+    missed = medications.mark_missed(now)
+    margin = timedelta(minutes=window)
+    lines = [f'{dose.scheduled_at:%Y-%m-%d %H:%M}\tuser {dose.user_id}\t'
+             f'{medication.name} ({medication.dosage})'
+             for dose, medication in medications.due_doses(now - margin, now + margin)]
+    db.session.commit()
+
+    for line in lines:
+        click.echo(line)
+    click.echo(f'{len(lines)} doses due, {missed} marked missed', err=True)
+
+
+@reminders.command('follow-ups')
+@click.option('--days', default=1, show_default=True,
+              help='Days ahead to include after today (0: today only).')
+@with_appcontext
+def due_follow_ups_command(days):
+    """List therapy follow-ups due today and in the next days across all users."""
+    today = datetime.utcnow().date()
+    due = due_follow_ups(today, today + timedelta(days=days))
+    for session in due:
+        click.echo(f'{session.follow_up_date:%Y-%m-%d}\tuser {session.user_id}\t'
+                   f'{session.therapist or ""}')
+    click.echo(f'{len(due)} follow-ups due', err=True)
+
+
+@click.group('upgrade')
+def upgrade():
+    """Data upgrades and backfills, see app.core.upgrades."""
+
+
+@upgrade.command('entry-types')
+@with_appcontext
+def upgrade_entry_types_command():
+    """Split fitness entries into daily and session rows and merge duplicate days."""
+    merged = upgrades.upgrade_entry_types()
+    db.session.commit()
+    click.echo(f'Merged {merged} duplicate rows; one-entry-per-day indexes in place')
+
+
+@upgrade.command('daily-summaries')
+@with_appcontext
+def upgrade_daily_summaries_command():
+    """Rebuild every user's daily summary rows from their full history."""
+    user_ids = db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+    rows = 0
+    for user_id in user_ids:
+        rows += upgrades.backfill_daily_summaries(user_id)
+        # One transaction per user keeps each one short
+        db.session.commit()
+    click.echo(f'Wrote {rows} daily summary rows for {len(user_ids)} users')
+
+
+@upgrade.command('vitals-baselines')
+@with_appcontext
+def upgrade_vitals_baselines_command():
+    """Recompute every user's vital sign baselines from all their readings."""
+    user_ids = db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+    for user_id in user_ids:
+        rebuild_baselines(user_id)
+        db.session.commit()
+    click.echo(f'Rebuilt vital sign baselines for {len(user_ids)} users')
+
+
+def register_commands(app):
+    """Attach the project's CLI commands to `app`."""
+    app.cli.add_command(import_command)
+    app.cli.add_command(insights)
+    app.cli.add_command(reminders)
+    app.cli.add_command(upgrade)
@@ -0,0 +1,19 @@
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import SelectField, SubmitField
+from wtforms.validators import DataRequired
+from flask_babel import lazy_gettext as _l
+
+class ImportForm(FlaskForm):
+    """Form for uploading a file of daily records exported from another tracker."""
+    target = SelectField(_l('Data Type'),
+                         choices=[
+                             ('fitness', _l('Fitness')),
+                             ('health', _l('Health'))
+                         ],
+                         validators=[DataRequired()])
+    
+    file = FileField(_l('File (CSV or JSON Lines)'),
+                     validators=[FileRequired(), FileAllowed(['csv', 'jsonl', 'ndjson'])])
+    
+    submit = SubmitField(_l('Import'))
@@ -0,0 +1,398 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from wtforms import BooleanField, FloatField, IntegerField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import NumberRange
+
+from app import db
+from app.core.rollup import refresh_daily_summary_range
+from app.utils.sql import dialect_insert
+from app.modules.fitness.forms import FitnessMetricForm
+from app.modules.fitness.models import FitnessMetric
+from app.modules.health.forms import HealthSurveyForm
+from app.modules.health.models import HealthSurvey
+from app.modules.health.vitals import rebuild_baselines
+
+# Rows validated and loaded per round trip; bounds the importer's memory
+CHUNK_SIZE = 5000
+
+# Number of rejected rows described in the report
+MAX_ERRORS = 20
+
+
+class ImportTooLarge(ValueError):
+    """Raised when a file has more records than the import may take."""
+
+_FIELD_KINDS = {IntegerField: 'int', FloatField: 'float', BooleanField: 'bool'}
+# Largest magnitude of each integer column type
+_INT_LIMITS = ((db.SmallInteger, 2 ** 15), (db.BigInteger, 2 ** 63), (db.Integer, 2 ** 31))
+_DATE_FORMAT = re.compile(r'\d{4}-\d{2}-\d{2}')
+_BOOLEANS = {'1': True, 'true': True, 'yes': True, 'y': True,
+             '0': False, 'false': False, 'no': False, 'n': False}
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """Importable column with the bounds of its form validator."""
+    name: str
+    kind: str
+    min: Optional[float]
+    max: Optional[float]
+
+
+@dataclass(frozen=True)
+class ImportTarget:
+    """Table that accepts imports, validated like the form that writes it."""
+    model: type
+    form: type
+    defaults: dict = field(default_factory=dict)
+    index_where: Optional[object] = None
+    # Called with the user id once the rows are loaded
+    after_import: Optional[Callable] = None
+
+    @property
+    def fields(self):
+        """Numeric and boolean form fields that map to a model column."""
+        columns = self.model.__table__.c
+        specs = {}
+        for name, unbound in vars(self.form).items():
+            if not isinstance(unbound, UnboundField) or name not in columns:
+                continue
+            kind = _FIELD_KINDS.get(unbound.field_class)
+            if kind is None:
+                continue
+            bounds = [validator for validator in unbound.kwargs.get('validators', ())
+                      if isinstance(validator, NumberRange)]
+            low = bounds[0].min if bounds else None
+            high = bounds[0].max if bounds else None
+            if kind == 'int':
+                # Keep unbounded integers within what the column can store
+                limit = next(limit for base, limit in _INT_LIMITS
+                             if isinstance(columns[name].type, base))
+                low = -limit if low is None else max(low, -limit)
+                high = limit - 1 if high is None else min(high, limit - 1)
+            specs[name] = FieldSpec(name, kind, low, high)
+        return specs
+
+
+TARGETS = {
+    'fitness': ImportTarget(FitnessMetric, FitnessMetricForm, defaults={'entry_type': 'daily'},
+                            index_where=db.text("entry_type = 'daily'")),
+    # Imported readings bypass the per-reading baseline updates
+    'health': ImportTarget(HealthSurvey, HealthSurveyForm, after_import=rebuild_baselines)
+}
+
+
+@dataclass
+class ImportReport:
+    """Outcome of one import run."""
+    target: str
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_rejected: int = 0
+    ignored_columns: Tuple[str, ...] = ()
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+    def reject(self, line, message):
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def guess_format(filename):
+    """Import format for a file name: 'jsonl' for .jsonl/.ndjson, else 'csv'."""
+    extension = os.path.splitext(filename)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def import_file(user_id, target_name, stream, file_format, chunk_size=CHUNK_SIZE, max_rows=None):
+    """Stream a CSV or JSONL file of daily records into a tracking table.
+
+    `stream` is a text stream whose records carry a ``date`` (YYYY-MM-DD)
+    and any of the numeric or boolean columns of the target. Records are
+    read, validated and loaded `chunk_size` at a time, so memory does not
+    depend on the file size. Rows outside the form's ranges are rejected;
+    a record for a day that already has an entry fills in that entry,
+    keeping existing values where the file has none. The rollup is
+    refreshed over the imported range and the target's `after_import`
+    hook run; the caller commits.
+
+    Raises `ImportTooLarge` as soon as more than `max_rows` records have
+    been read; the caller then rolls back.
+    """
+    target = TARGETS[target_name]
+    specs = target.fields
+    report = ImportReport(target_name)
+    start = time.perf_counter()
+
+    if file_format == 'csv':
+        records = _read_csv(stream)
+    elif file_format == 'jsonl':
+        records = _read_jsonl(stream)
+    else:
+        raise ValueError(f'Unsupported import format: {file_format}')
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        loader = _CopyLoader(user_id, target)
+    else:
+        loader = _ExecutemanyLoader(user_id, target)
+
+    ignored = set()
+    first_date = last_date = None
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        report.rows_read += len(chunk)
+        if max_rows is not None and report.rows_read > max_rows:
+            raise ImportTooLarge(max_rows)
+
+        parsed = []
+        for line, record in chunk:
+            if not isinstance(record, dict):
+                report.reject(line, 'malformed record')
+            else:
+                ignored.update(key for key in record if key != 'date' and key not in specs)
+                parsed.append((line, record))
+
+        rows = _validate(parsed, specs, report)
+        if rows:
+            dates = [row['date'] for row in rows]
+            first_date = min(dates + ([first_date] if first_date else []))
+            last_date = max(dates + ([last_date] if last_date else []))
+            loader.load(rows)
+            report.rows_imported += len(rows)
+    loader.close()
+
+    if first_date is not None:
+        refresh_daily_summary_range(user_id, first_date, last_date)
+        if target.after_import is not None:
+            target.after_import(user_id)
+
+    report.ignored_columns = tuple(sorted(ignored))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _read_csv(stream):
+    # Line 1 is the header
+    for line, record in enumerate(csv.DictReader(stream), start=2):
+        yield line, record
+
+
+def _read_jsonl(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+def _validate(parsed, specs, report):
+    """Vectorized validation of one chunk; returns the accepted rows as dicts.
+
+    Every column is converted to a float array (NaN for missing values) and
+    checked against its range with array operations. When a file repeats a
+    date, the last record wins.
+    """
+    if not parsed:
+        return []
+    lines = np.array([line for line, _ in parsed])
+    records = [record for _, record in parsed]
+    problems = [None] * len(records)
+
+    def flag(mask, message):
+        for index in np.flatnonzero(mask):
+            if problems[index] is None:
+                problems[index] = message
+
+    dates = _to_dates([record.get('date') for record in records])
+    flag(np.isnat(dates), 'date: missing or not YYYY-MM-DD')
+
+    columns = {}
+    for name in {key for record in records for key in record} & specs.keys():
+        spec = specs[name]
+        raw = [record.get(name) for record in records]
+        values, malformed = (_to_bools if spec.kind == 'bool' else _to_floats)(raw)
+        flag(malformed, f'{name}: not a number' if spec.kind != 'bool' else f'{name}: not a boolean')
+        flag(np.isinf(values), f'{name}: not a finite number')
+        present = ~np.isnan(values)
+        if spec.kind == 'int':
+            flag(present & (values != np.floor(values)), f'{name}: not an integer')
+        if spec.min is not None:
+            flag(present & (values < spec.min), f'{name}: below {spec.min}')
+        if spec.max is not None:
+            flag(present & (values > spec.max), f'{name}: above {spec.max}')
+        columns[name] = values
+
+    rows = {}
+    for index, problem in enumerate(problems):
+        if problem is not None:
+            report.reject(int(lines[index]), problem)
+            continue
+        row = {'date': dates[index].item()}
+        for name, values in columns.items():
+            value = values[index]
+            if np.isnan(value):
+                row[name] = None
+            elif specs[name].kind == 'int':
+                row[name] = int(value)
+            elif specs[name].kind == 'bool':
+                row[name] = bool(value)
+            else:
+                row[name] = float(value)
+        rows[row['date']] = row
+
+    # Records of a chunk may not share the same set of columns
+    names = set(columns)
+    return [dict({name: None for name in names}, **row) for row in rows.values()]
+
+
+def _to_dates(raw):
+    # NumPy also accepts partial dates, times and other layouts: only pass it
+    # strings shaped like YYYY-MM-DD
+    values = [value if isinstance(value, str) and _DATE_FORMAT.fullmatch(value) else 'NaT'
+              for value in raw]
+    try:
+        return np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        return np.array([_to_date(value) for value in values], dtype='datetime64[D]')
+
+
+def _to_date(value):
+    try:
+        return np.datetime64(datetime.strptime(value, '%Y-%m-%d').date(), 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+
+def _to_floats(raw):
+    values = [None if value == '' else value for value in raw]
+    try:
+        array = np.array(values, dtype=float)
+        return array, np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+
+    array = np.full(len(values), np.nan)
+    malformed = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        try:
+            array[index] = np.nan if value is None else float(value)
+        except (TypeError, ValueError):
+            malformed[index] = True
+    return array, malformed
+
+
+def _to_bools(raw):
+    array = np.full(len(raw), np.nan)
+    malformed = np.zeros(len(raw), dtype=bool)
+    for index, value in enumerate(raw):
+        if value is None or value == '':
+            continue
+        key = str(value).strip().lower()
+        if key in _BOOLEANS:
+            array[index] = _BOOLEANS[key]
+        else:
+            malformed[index] = True
+    return array, malformed
+
+
+def _upsert(insert, target, columns):
+    """Attach the ON CONFLICT merge of imported rows into existing entries."""
+    table = target.model.__table__
+    return insert.on_conflict_do_update(
+        index_elements=['user_id', 'date'],
+        index_where=target.index_where,
+        set_={name: db.func.coalesce(insert.excluded[name], table.c[name]) for name in columns}
+    )
+
+
+class _CopyLoader:
+    """Load chunks with COPY into a temporary staging table, then merge.
+
+    COPY avoids per-row statement overhead, and the merge is a single
+    INSERT ... SELECT with ON CONFLICT against the (user_id, date) unique
+    index. The staging table is emptied after every chunk.
+    """
+
+    def __init__(self, user_id, target):
+        self.user_id = user_id
+        self.target = target
+        self.staging = None
+
+    def _create_staging(self, names):
+        table = self.target.model.__table__
+        self.staging = db.Table(
+            f'import_{table.name}', db.MetaData(),
+            *[db.Column(name, table.c[name].type) for name in ['date'] + names],
+            prefixes=['TEMPORARY'], postgresql_on_commit='DROP'
+        )
+        self.staging.create(db.session.connection())
+
+    def load(self, rows):
+        names = sorted(name for name in rows[0] if name != 'date')
+        if self.staging is None or self.staging.c.keys() != ['date'] + names:
+            self.close()
+            self._create_staging(names)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row['date'].isoformat()] + [row[name] for name in names])
+        buffer.seek(0)
+        cursor = db.session.connection().connection.driver_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {self.staging.name} (date, {', '.join(names)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+        table = self.target.model.__table__
+        extra = dict(self.target.defaults, user_id=self.user_id, created_at=datetime.utcnow())
+        insert = dialect_insert(self.target.model).from_select(
+            list(extra) + ['date'] + names,
+            db.select(*[db.literal(value, table.c[name].type) for name, value in extra.items()],
+                      *[self.staging.c[name] for name in ['date'] + names])
+        )
+        db.session.execute(_upsert(insert, self.target, names))
+        db.session.execute(db.delete(self.staging))
+
+    def close(self):
+        if self.staging is not None:
+            self.staging.drop(db.session.connection())
+            self.staging = None
+
+
+class _ExecutemanyLoader:
+    """Fallback without COPY: one executemany INSERT ... ON CONFLICT per chunk."""
+
+    def __init__(self, user_id, target):
+        self.user_id = user_id
+        self.target = target
+
+    def load(self, rows):
+        names = [name for name in rows[0] if name != 'date']
+        extra = dict(self.target.defaults, user_id=self.user_id, created_at=datetime.utcnow())
+        insert = dialect_insert(self.target.model)
+        db.session.execute(_upsert(insert, self.target, names),
+                           [dict(extra, **row) for row in rows])
+
+    def close(self):
+        pass
@@ -0,0 +1,254 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Tuple
+
+import numpy as np
+from sqlalchemy import event
+
+from app import db
+from app.auth.models import User
+from app.core.models import UserDailySummary, UserInsight
+from app.core.signals import pending_changes
+from app.utils.sql import dialect_insert
+
+# Days of history correlated
+INSIGHT_DAYS = 180
+
+# Correlations are computed between a metric on one day and a metric up to
+# this many days later
+MAX_LAG = 3
+
+# Day pairs needed before a correlation is reported
+MIN_PAIRS = 14
+
+# Users per batch job task
+BATCH_SIZE = 100
+
+
+def _tracked(column, entries):
+    # Activity totals are 0 on days without fitness entries: untracked, not idle
+    return db.case((entries > 0, column))
+
+
+METRICS = {
+    'mood_rating': UserDailySummary.mood_rating,
+    'sleep_duration': UserDailySummary.sleep_duration,
+    'sleep_quality': UserDailySummary.sleep_quality,
+    'steps': _tracked(UserDailySummary.steps, UserDailySummary.fitness_entries),
+    'active_minutes': _tracked(UserDailySummary.active_minutes, UserDailySummary.fitness_entries),
+}
+
+
+@dataclass(frozen=True)
+class Correlation:
+    """Correlation of `metric` on one day with `other` `lag` days later."""
+    metric: str
+    other: str
+    lag: int
+    r: float
+    pairs: int
+
+
+@dataclass(frozen=True)
+class Insights:
+    """Lagged correlation matrices of a user's daily metrics.
+
+    ``correlations[lag, i, j]`` correlates metric i on day t with metric j
+    on day t + lag over the days where both are known; ``pairs`` holds the
+    number of such days. Undefined correlations are NaN.
+    """
+    metrics: Tuple[str, ...]
+    days: int
+    correlations: np.ndarray
+    pairs: np.ndarray
+    computed_at: datetime
+
+    def strongest(self, limit=5, min_r=0.3):
+        """The strongest relationships between different metrics, strongest first."""
+        found = []
+        for lag, i, j in zip(*np.nonzero(np.abs(np.nan_to_num(self.correlations)) >= min_r)):
+            # Same-day matrices are symmetric; self-correlations say nothing
+            if i == j or (lag == 0 and i > j):
+                continue
+            found.append(Correlation(self.metrics[i], self.metrics[j], int(lag),
+                                     float(self.correlations[lag, i, j]),
+                                     int(self.pairs[lag, i, j])))
+        found.sort(key=lambda item: abs(item.r), reverse=True)
+        return found[:limit]
+
+    def to_dict(self):
+        return {
+            'metrics': list(self.metrics),
+            'days': self.days,
+            'correlations': [[[None if np.isnan(r) else round(float(r), 4) for r in row]
+                              for row in matrix] for matrix in self.correlations],
+            'pairs': self.pairs.tolist(),
+            'computed_at': self.computed_at.isoformat()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            metrics=tuple(data['metrics']),
+            days=data['days'],
+            correlations=np.array(data['correlations'], dtype=float),
+            pairs=np.array(data['pairs'], dtype=np.int64),
+            computed_at=datetime.fromisoformat(data['computed_at'])
+        )
+
+
+def daily_matrix(user_id, today=None):
+    """Date-aligned matrix of the user's metrics over the last INSIGHT_DAYS.
+
+    Reads the daily rollup, which already joins the mental, health and
+    fitness tables by day, in one query. Returns a (days, metrics) float
+    array with one row per calendar day and NaN where a value is missing.
+    """
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=INSIGHT_DAYS - 1)
+    rows = db.session.execute(
+        db.select(UserDailySummary.date, *[column.label(name) for name, column in METRICS.items()])
+        .where(UserDailySummary.user_id == user_id, UserDailySummary.date >= start,
+               UserDailySummary.date <= today)
+    ).all()
+
+    matrix = np.full((INSIGHT_DAYS, len(METRICS)), np.nan)
+    if rows:
+        index = np.array([(row.date - start).days for row in rows])
+        # None becomes NaN in float arrays
+        matrix[index] = np.array([row[1:] for row in rows], dtype=float)
+    return matrix
+
+
+def lagged_correlations(matrix, max_lag=MAX_LAG, min_pairs=MIN_PAIRS):
+    """Pearson correlations between every pair of columns at each lag.
+
+    For each lag the sums needed by every pairwise-complete correlation are
+    obtained with a few matrix products over masked copies of the data, so
+    no pair is handled in a Python loop. Returns ``(correlations, pairs)``,
+    two arrays of shape (max_lag + 1, columns, columns).
+    """
+    days, width = matrix.shape
+    correlations = np.full((max_lag + 1, width, width), np.nan)
+    pairs = np.zeros((max_lag + 1, width, width), dtype=np.int64)
+
+    for lag in range(min(max_lag, days - 1) + 1):
+        leading, lagging = matrix[:days - lag], matrix[lag:]
+        known_a = (~np.isnan(leading)).astype(float)
+        known_b = (~np.isnan(lagging)).astype(float)
+        a = np.nan_to_num(leading)
+        b = np.nan_to_num(lagging)
+
+        count = known_a.T @ known_b
+        sum_a = a.T @ known_b
+        sum_b = known_a.T @ b
+        covariance = count * (a.T @ b) - sum_a * sum_b
+        variance_a = count * ((a * a).T @ known_b) - sum_a ** 2
+        variance_b = count * (known_a.T @ (b * b)) - sum_b ** 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = covariance / np.sqrt(variance_a * variance_b)
+        valid = (count >= min_pairs) & (variance_a > 0) & (variance_b > 0)
+        correlations[lag] = np.where(valid, np.clip(r, -1, 1), np.nan)
+        pairs[lag] = count.astype(np.int64)
+    return correlations, pairs
+
+
+def compute_insights(user_id, today=None):
+    matrix = daily_matrix(user_id, today)
+    correlations, pairs = lagged_correlations(matrix)
+    tracked_days = int(np.count_nonzero(~np.isnan(matrix).all(axis=1)))
+    return Insights(tuple(METRICS), tracked_days, correlations, pairs, datetime.utcnow())
+
+
+def store_insights(user_id, insights, version=0):
+    """Save fresh insights for a user, replacing any stale ones. The caller commits.
+
+    `version` is the user's insight version read before the computation
+    started; if entries changed since, the version has moved on and the
+    stored row is left stale, so insights computed from an older snapshot
+    never overwrite a newer invalidation.
+    """
+    values = dict(user_id=user_id, computed_at=insights.computed_at, stale=False,
+                  version=version, data=insights.to_dict())
+    stmt = dialect_insert(UserInsight).values(values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={name: stmt.excluded[name] for name in ('computed_at', 'stale', 'data')},
+        where=UserInsight.version == version
+    ))
+
+
+def get_insights(user_id):
+    """Insights of a user, recomputed only when their entries changed.
+
+    Returns the stored insights when they are fresh; otherwise computes
+    and stores them, in which case the caller commits.
+    """
+    cached = db.session.get(UserInsight, user_id)
+    if cached is not None and not cached.stale:
+        return Insights.from_dict(cached.data)
+    insights = compute_insights(user_id)
+    store_insights(user_id, insights, cached.version if cached is not None else 0)
+    return insights
+
+
+@event.listens_for(db.session, 'before_commit')
+def _mark_stale(session):
+    # Same transaction as the entry changes, so no reader sees them with
+    # insights that are still marked fresh. The row is created if missing,
+    # so that a reader computing from an earlier snapshot finds its version
+    # outdated whether or not the user had insights yet.
+    changed = pending_changes(session)
+    if changed:
+        stmt = dialect_insert(UserInsight).values([
+            dict(user_id=user_id, computed_at=datetime.utcnow(), stale=True, version=1, data=db.null())
+            for user_id in sorted(changed)
+        ])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'stale': True, 'version': UserInsight.version + 1}
+        ))
+
+
+def refresh_all(workers=None, config_name='default'):
+    """Recompute the missing and stale insights of all active users.
+
+    Users are split into tasks of BATCH_SIZE and spread over a pool of
+    `workers` processes (default: one per CPU), each with its own
+    application and database connections. With one worker the tasks run
+    in this process. Returns the number of users refreshed.
+    """
+    user_ids = db.session.execute(
+        db.select(User.id)
+        .outerjoin(UserInsight, UserInsight.user_id == User.id)
+        .where(User.is_active.is_(True),
+               db.or_(UserInsight.user_id.is_(None), UserInsight.stale.is_(True)))
+        .order_by(User.id)
+    ).scalars().all()
+    tasks = [user_ids[start:start + BATCH_SIZE] for start in range(0, len(user_ids), BATCH_SIZE)]
+
+    if workers == 1:
+        return sum(_refresh_users(task) for task in tasks)
+
+    # Spawned workers do not inherit this process's connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(config_name,)) as pool:
+        return sum(pool.map(_refresh_users, tasks))
+
+
+def _init_worker(config_name):
+    from app import create_app
+    create_app(config_name).app_context().push()
+
+
+def _refresh_users(user_ids):
+    versions = dict(db.session.execute(
+        db.select(UserInsight.user_id, UserInsight.version).where(UserInsight.user_id.in_(user_ids))
+    ).all())
+    for user_id in user_ids:
+        store_insights(user_id, compute_insights(user_id), versions.get(user_id, 0))
+    db.session.commit()
+    return len(user_ids)
@@ -0,0 +1,63 @@
+from datetime import datetime
+from app import db
+
+class UserDailySummary(db.Model):
+    """Per-user daily rollup of the key metrics from all tracking modules.
+
+    Rows are maintained by `app.core.rollup` in the same transaction as the
+    writes to the source tables, so overview pages can read a handful of
+    small rows instead of aggregating raw entries on every request.
+    """
+    __tablename__ = 'user_daily_summary'
+    __table_args__ = (
+        # Rows rewritten since a cache entry was computed, see rollup.changed_since
+        db.Index('ix_user_daily_summary_updated', 'user_id', 'updated_at'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Mental wellness (daily averages)
+    mental_entries = db.Column(db.Integer, nullable=False, default=0)
+    mood_rating = db.Column(db.Float)
+    anxiety_level = db.Column(db.Float)
+    journal_entries = db.Column(db.Integer, nullable=False, default=0)
+
+    # Health (daily averages)
+    health_entries = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float)  # in kg
+    sleep_duration = db.Column(db.Float)  # in hours
+    sleep_quality = db.Column(db.Float)  # scale 1-10
+    energy_level = db.Column(db.Float)  # scale 1-10
+    stress_level = db.Column(db.Float)  # scale 1-10
+    water_intake = db.Column(db.Float)  # in liters
+
+    # Fitness (daily totals)
+    fitness_entries = db.Column(db.Integer, nullable=False, default=0)
+    steps = db.Column(db.Integer, nullable=False, default=0)
+    distance = db.Column(db.Float, nullable=False, default=0)  # in km
+    active_minutes = db.Column(db.Integer, nullable=False, default=0)
+    calories_burned = db.Column(db.Integer, nullable=False, default=0)
+    workout_duration = db.Column(db.Integer, nullable=False, default=0)  # in minutes
+
+    def __repr__(self):
+        return f'<UserDailySummary {self.user_id} on {self.date}>'
+
+class UserInsight(db.Model):
+    """Cached cross-module correlations of a user (see `app.core.insights`).
+
+    Marked stale, and its version bumped, in the transaction that changes
+    the user's entries; recomputed on the next read or by the batch job.
+    `data` is NULL until the first computation.
+    """
+    __tablename__ = 'user_insights'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data = db.Column(db.JSON)
+
+    def __repr__(self):
+        return f'<UserInsight {self.user_id}>'
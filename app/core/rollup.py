@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.core.models import UserDailySummary
+from app.core.signals import mark_entries_changed
+from app.modules.mental.models import MentalWellness
+from app.modules.health.models import HealthSurvey
+from app.modules.fitness.models import FitnessMetric
+
+# Summary rows are stamped before their transaction commits; look back this
+# far when checking for changes made by other processes
+COMMIT_LAG = timedelta(minutes=1)
+
+# Summary columns filled by counting or summing source rows (0 when absent)
+_COUNTERS = [
+    'mental_entries', 'journal_entries', 'health_entries', 'fitness_entries',
+    'steps', 'active_minutes', 'calories_burned', 'workout_duration', 'distance'
+]
+
+# Summary columns filled by averaging source rows (NULL when absent)
+_AVERAGES = [
+    'mood_rating', 'anxiety_level', 'weight', 'sleep_duration', 'sleep_quality',
+    'energy_level', 'stress_level', 'water_intake'
+]
+
+
+def _module_select(model, day_filter, user_id, **aggregates):
+    """Per-day aggregates of one source table, padded to the summary layout."""
+    columns = [model.date.label('date')]
+    for name in _COUNTERS + _AVERAGES:
+        if name in aggregates:
+            columns.append(aggregates[name].label(name))
+        else:
+            column_type = UserDailySummary.__table__.c[name].type
+            columns.append(db.cast(db.null(), column_type).label(name))
+
+    return db.select(*columns)\
+        .where(model.user_id == user_id, day_filter(model.date))\
+        .group_by(model.date)
+
+
+def _refresh(user_id, day_filter):
+    # Make pending ORM changes visible to the aggregate queries below
+    db.session.flush()
+
+    removed = db.session.execute(
+        db.delete(UserDailySummary).where(
+            UserDailySummary.user_id == user_id,
+            day_filter(UserDailySummary.date)
+        ).returning(UserDailySummary.date)
+    ).scalars().all()
+
+    func = db.func
+    mental = _module_select(
+        MentalWellness, day_filter, user_id,
+        mental_entries=func.count(MentalWellness.id),
+        journal_entries=func.count(func.nullif(MentalWellness.journal_entry, '')),
+        mood_rating=func.avg(MentalWellness.mood_rating),
+        anxiety_level=func.avg(MentalWellness.anxiety_level)
+    )
+    health = _module_select(
+        HealthSurvey, day_filter, user_id,
+        health_entries=func.count(HealthSurvey.id),
+        weight=func.avg(HealthSurvey.weight),
+        sleep_duration=func.avg(HealthSurvey.sleep_duration),
+        sleep_quality=func.avg(HealthSurvey.sleep_quality),
+        energy_level=func.avg(HealthSurvey.energy_level),
+        stress_level=func.avg(HealthSurvey.stress_level),
+        water_intake=func.avg(HealthSurvey.water_intake)
+    )
+    fitness = _module_select(
+        FitnessMetric, day_filter, user_id,
+        fitness_entries=func.count(FitnessMetric.id),
+        steps=func.sum(FitnessMetric.steps),
+        distance=func.sum(FitnessMetric.distance),
+        active_minutes=func.sum(FitnessMetric.active_minutes),
+        calories_burned=func.sum(FitnessMetric.calories_burned),
+        workout_duration=func.sum(FitnessMetric.workout_duration)
+    )
+    days = db.union_all(mental, health, fitness).subquery('days')
+
+    # Each summary column is produced by exactly one branch of the union, so
+    # collapsing the branches per day only has to skip the NULL padding.
+    now = datetime.utcnow()
+    columns = [db.literal(user_id).label('user_id'), days.c.date,
+               db.literal(now).label('updated_at')]
+    columns += [func.coalesce(func.sum(days.c[name]), 0).label(name) for name in _COUNTERS]
+    columns += [func.max(days.c[name]).label(name) for name in _AVERAGES]
+
+    written = db.session.execute(
+        db.insert(UserDailySummary).from_select(
+            [column.name for column in columns],
+            db.select(*columns).group_by(days.c.date)
+        ).returning(UserDailySummary.date)
+    ).scalars().all()
+
+    # Days whose last entry was deleted keep an empty row (counters at 0,
+    # averages NULL) so that their updated_at still tells caches in other
+    # processes that the day changed
+    emptied = set(removed) - set(written)
+    if emptied:
+        db.session.execute(db.insert(UserDailySummary), [
+            {'user_id': user_id, 'date': day, 'updated_at': now} for day in sorted(emptied)
+        ])
+
+
+def refresh_daily_summary(user_id, *dates):
+    """Recompute the summary rows of `user_id` for the given dates.
+
+    Must be called before the commit of every write to the mental, health or
+    fitness tables so that the rollup stays consistent with its sources.
+    When an entry moves to another date, pass both the old and new date.
+    Listeners of `entries_changed` are notified once the transaction commits.
+    """
+    dates = sorted({day for day in dates if day is not None})
+    if dates:
+        _refresh(user_id, lambda column: column.in_(dates))
+        mark_entries_changed(user_id, dates[0])
+
+
+def refresh_daily_summary_range(user_id, start_date, end_date):
+    """Recompute the summary rows of `user_id` between two dates (inclusive)."""
+    _refresh(user_id, lambda column: column.between(start_date, end_date))
+    mark_entries_changed(user_id, start_date)
+
+
+def changed_since(user_id, since, after=None):
+    """Earliest date of the summary rows of `user_id` rewritten since `since`, or None.
+
+    Lets per-process caches notice writes committed by other processes.
+    Only dates later than `after` are considered when it is given. Served
+    by the (user_id, updated_at) index, so the cost depends on the number
+    of recent changes, not on the length of the history.
+    """
+    conditions = [UserDailySummary.user_id == user_id,
+                  UserDailySummary.updated_at > since - COMMIT_LAG]
+    if after is not None:
+        conditions.append(UserDailySummary.date > after)
+    return db.session.execute(
+        db.select(db.func.min(UserDailySummary.date)).where(*conditions)
+    ).scalar()
@@ -1,11 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, session, request
+import io
+
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, session, request, jsonify
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from app import db
-from app.modules.mental.models import MentalWellness
-from app.modules.health.models import HealthSurvey
-from app.modules.fitness.models import FitnessMetric
+from app.auth.models import user_writes
+from app.core.forms import ImportForm
+from app.core.importer import ImportTooLarge, guess_format, import_file
+from app.core.insights import get_insights
+from app.core.services import load_dashboard
 
 # Create blueprint
 core_bp = Blueprint('core', __name__)
@@ -17,23 +23,53 @@ def index():
         return redirect(url_for('core.dashboard'))
     return render_template('index.html', title=_('Welcome to NurAI'))
 
+@core_bp.route('/healthz')
+def healthz():
+    """Liveness probe: the worker answers requests."""
+    return 'ok'
+
+@core_bp.route('/readyz')
+def readyz():
+    """Readiness probe: the worker can reach the database."""
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except SQLAlchemyError:
+        db.session.rollback()
+        return 'database unavailable', 503
+    return 'ok'
+
 @core_bp.route('/dashboard')
 @login_required
 def dashboard():
     """User dashboard with overview of all tracking modules."""
-    # Get the most recent entries from each tracking module
-    recent_mental = MentalWellness.query.filter_by(user_id=current_user.id).order_by(MentalWellness.date.desc()).first()
-    recent_health = HealthSurvey.query.filter_by(user_id=current_user.id).order_by(HealthSurvey.date.desc()).first()
-    recent_fitness = FitnessMetric.query.filter_by(user_id=current_user.id).order_by(FitnessMetric.date.desc()).first()
-    
-    # Get weekly statistics
-    # In a real application, you would calculate averages, trends, etc.
+    # Latest entries from each tracking module plus weekly statistics,
+    # fetched in a single round trip
+    snapshot = load_dashboard(current_user.id)
     
     return render_template('dashboard.html', 
                           title=_('Dashboard'),
-                          recent_mental=recent_mental,
-                          recent_health=recent_health,
-                          recent_fitness=recent_fitness)
+                          snapshot=snapshot)
+
+@core_bp.route('/insights')
+@login_required
+def insights():
+    """How mood, sleep and activity relate to each other for the user."""
+    result = get_insights(current_user.id)
+    db.session.commit()
+    
+    return render_template('insights.html',
+                          title=_('Insights'),
+                          insights=result,
+                          strongest=result.strongest())
+
+@core_bp.route('/api/insights')
+@login_required
+def api_insights():
+    """Lagged correlation matrices as JSON."""
+    result = get_insights(current_user.id)
+    db.session.commit()
+    return jsonify(dict(result.to_dict(),
+                        strongest=[correlation.__dict__ for correlation in result.strongest()]))
 
 @core_bp.route('/set_language/<language>')
 def set_language(language):
@@ -41,15 +77,59 @@ def set_language(language):
     # Store the language preference in the session
     session['language'] = language
     
-    # If user is logged in, store the preference in their profile
-    if current_user.is_authenticated:
-        current_user.language_preference = language
-        db.session.commit()
+    # If user is logged in, store the preference in their profile with the
+    # next batched write; the session already carries it meanwhile
+    if current_user.is_authenticated and language in current_app.config['LANGUAGES']:
+        user_writes.set(current_user.id, language_preference=language)
     
     # Redirect back to the previous page or home
     next_page = request.args.get('next') or request.referrer or url_for('core.index')
     return redirect(next_page)
 
+@core_bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    """Upload over MAX_CONTENT_LENGTH: point to the command-line import."""
+    flash(_('The file is too large to import here; use the "flask import" command instead.'),
+          'danger')
+    return redirect(url_for('core.import_data'))
+
+@core_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_data():
+    """Bulk import of daily records exported from another tracker."""
+    form = ImportForm()
+    
+    if form.validate_on_submit():
+        upload = form.file.data
+        # Decode the upload as it is read instead of loading it in memory
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        # Imports run within the request, which the server times out
+        try:
+            report = import_file(current_user.id, form.target.data, stream,
+                                 guess_format(upload.filename),
+                                 max_rows=current_app.config['IMPORT_MAX_ROWS'])
+        except UnicodeDecodeError:
+            db.session.rollback()
+            flash(_('The file is not valid UTF-8 text.'), 'danger')
+            return redirect(url_for('core.import_data'))
+        except ImportTooLarge:
+            db.session.rollback()
+            flash(_('The file has more than %(count)d rows; import it with the "flask import" '
+                    'command instead.', count=current_app.config['IMPORT_MAX_ROWS']), 'danger')
+            return redirect(url_for('core.import_data'))
+        db.session.commit()
+        
+        flash(_('Imported %(imported)d of %(read)d rows (%(rate)d rows/s).',
+                imported=report.rows_imported, read=report.rows_read,
+                rate=report.rows_per_second), 'success')
+        if report.rows_rejected:
+            flash(_('%(count)d rows were rejected, first at line %(line)d: %(error)s',
+                    count=report.rows_rejected, line=report.errors[0][0],
+                    error=report.errors[0][1]), 'warning')
+        return redirect(url_for('core.import_data'))
+    
+    return render_template('import.html', title=_('Import Data'), form=form)
+
 @core_bp.route('/about')
 def about():
     """About page."""
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from app import db
+from app.auth.models import User
+from app.modules.mental.models import MentalWellness
+from app.modules.health.models import HealthSurvey
+from app.modules.fitness.models import FitnessMetric
+
+
+@dataclass(frozen=True)
+class RecentMental:
+    """Most recent mental wellness entry shown on the dashboard."""
+    date: date
+    mood_rating: Optional[int]
+    anxiety_level: Optional[int]
+
+
+@dataclass(frozen=True)
+class RecentHealth:
+    """Most recent health survey shown on the dashboard."""
+    date: date
+    blood_pressure_systolic: Optional[int]
+    blood_pressure_diastolic: Optional[int]
+    sleep_duration: Optional[float]
+
+
+@dataclass(frozen=True)
+class RecentFitness:
+    """Most recent fitness entry shown on the dashboard."""
+    date: date
+    steps: Optional[int]
+    workout_type: Optional[str]
+
+
+@dataclass(frozen=True)
+class WeeklyStats:
+    """Aggregates for the current week (Monday to Sunday)."""
+    week_start: date
+    total_workouts: int
+    total_duration: int
+    total_steps: int
+    mood_avg: Optional[float]
+    sleep_avg: Optional[float]
+
+
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """Everything the dashboard template needs, loaded in one statement."""
+    mental: Optional[RecentMental]
+    health: Optional[RecentHealth]
+    fitness: Optional[RecentFitness]
+    weekly: WeeklyStats
+
+    @property
+    def is_empty(self):
+        return self.mental is None and self.health is None and self.fitness is None
+
+
+def _latest(model, *columns):
+    """LATERAL subquery returning the newest row of `model` for the outer user."""
+    return db.select(model.date, *columns)\
+        .where(model.user_id == User.id)\
+        .order_by(model.date.desc())\
+        .limit(1)\
+        .lateral(f'latest_{model.__tablename__}')
+
+
+def load_dashboard(user_id, today=None):
+    """Load the dashboard snapshot for a user in a single round trip.
+
+    The latest mental, health and fitness rows and the weekly aggregates are
+    each expressed as a LATERAL subquery correlated to the user row, so the
+    database resolves all of them with index lookups in one statement.
+    """
+    today = today or datetime.utcnow().date()
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=6)
+
+    mental = _latest(MentalWellness, MentalWellness.mood_rating, MentalWellness.anxiety_level)
+    health = _latest(HealthSurvey, HealthSurvey.blood_pressure_systolic,
+                     HealthSurvey.blood_pressure_diastolic, HealthSurvey.sleep_duration)
+    fitness = _latest(FitnessMetric, FitnessMetric.steps, FitnessMetric.workout_type)
+
+    fitness_week = db.select(
+        db.func.count(FitnessMetric.id).label('total_workouts'),
+        db.func.coalesce(db.func.sum(FitnessMetric.workout_duration), 0).label('total_duration'),
+        db.func.coalesce(db.func.sum(FitnessMetric.steps), 0).label('total_steps')
+    ).where(
+        FitnessMetric.user_id == User.id,
+        FitnessMetric.date.between(week_start, week_end)
+    ).lateral('fitness_week')
+
+    mental_week = db.select(
+        db.func.avg(MentalWellness.mood_rating).label('mood_avg')
+    ).where(
+        MentalWellness.user_id == User.id,
+        MentalWellness.date.between(week_start, week_end)
+    ).lateral('mental_week')
+
+    health_week = db.select(
+        db.func.avg(HealthSurvey.sleep_duration).label('sleep_avg')
+    ).where(
+        HealthSurvey.user_id == User.id,
+        HealthSurvey.date.between(week_start, week_end)
+    ).lateral('health_week')
+
+    stmt = db.select(
+        mental.c.date.label('mental_date'), mental.c.mood_rating, mental.c.anxiety_level,
+        health.c.date.label('health_date'), health.c.blood_pressure_systolic,
+        health.c.blood_pressure_diastolic, health.c.sleep_duration,
+        fitness.c.date.label('fitness_date'), fitness.c.steps, fitness.c.workout_type,
+        fitness_week.c.total_workouts, fitness_week.c.total_duration, fitness_week.c.total_steps,
+        mental_week.c.mood_avg, health_week.c.sleep_avg
+    ).select_from(
+        User.__table__
+        .outerjoin(mental, db.true())
+        .outerjoin(health, db.true())
+        .outerjoin(fitness, db.true())
+        .join(fitness_week, db.true())
+        .join(mental_week, db.true())
+        .join(health_week, db.true())
+    ).where(User.id == user_id)
+
+    row = db.session.execute(stmt).one()
+
+    return DashboardSnapshot(
+        mental=RecentMental(row.mental_date, row.mood_rating, row.anxiety_level)
+        if row.mental_date is not None else None,
+        health=RecentHealth(row.health_date, row.blood_pressure_systolic,
+                            row.blood_pressure_diastolic, row.sleep_duration)
+        if row.health_date is not None else None,
+        fitness=RecentFitness(row.fitness_date, row.steps, row.workout_type)
+        if row.fitness_date is not None else None,
+        weekly=WeeklyStats(
+            week_start=week_start,
+            total_workouts=row.total_workouts,
+            total_duration=int(row.total_duration),
+            total_steps=int(row.total_steps),
+            mood_avg=float(row.mood_avg) if row.mood_avg is not None else None,
+            sleep_avg=float(row.sleep_avg) if row.sleep_avg is not None else None
+        )
+    )
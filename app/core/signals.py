@@ -0,0 +1,38 @@
+from flask.signals import Namespace
+from sqlalchemy import event
+
+from app import db
+
+_signals = Namespace()
+
+# Sent after a commit that changed a user's mental, health or fitness
+# entries. The sender is the user id; `first_date` is the earliest date
+# whose entries changed.
+entries_changed = _signals.signal('entries-changed')
+
+
+def mark_entries_changed(user_id, first_date):
+    """Queue an `entries_changed` notification for when the session commits."""
+    pending = db.session.info.setdefault('entries_changed', {})
+    if user_id not in pending or first_date < pending[user_id]:
+        pending[user_id] = first_date
+
+
+def pending_changes(session):
+    """Users whose entries changed in the current transaction, with their earliest date.
+
+    For `before_commit` listeners that need to write in the same transaction;
+    `entries_changed` is only sent once the commit has succeeded.
+    """
+    return dict(session.info.get('entries_changed', {}))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _send_entries_changed(session):
+    for user_id, first_date in session.info.pop('entries_changed', {}).items():
+        entries_changed.send(user_id, first_date=first_date)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_entries_changed(session):
+    session.info.pop('entries_changed', None)
@@ -0,0 +1,141 @@
+"""Data upgrades that schema autogeneration cannot express.
+
+Each upgrade is idempotent and run with ``flask upgrade <name>``. Schema
+changes (entry-types) run before ``flask db upgrade`` and leave the
+database as the models describe it, so a later autogenerated migration
+finds nothing left to do for them; backfills of derived tables
+(daily-summaries, vitals-baselines) run after it.
+"""
+from app import db
+from app.core.models import UserDailySummary
+from app.core.rollup import refresh_daily_summary, refresh_daily_summary_range
+from app.modules.fitness.models import Exercise, FitnessMetric
+from app.modules.health.models import HealthSurvey
+from app.modules.mental.models import MentalWellness
+
+# Columns only the daily tracking form fills; workout_session leaves them empty
+_DAILY_ONLY = ('steps', 'distance', 'active_minutes', 'calories_burned',
+               'heart_rate_avg', 'heart_rate_max', 'recovery_score', 'soreness_level')
+
+
+def upgrade_entry_types():
+    """Add fitness_metrics.entry_type and the one-entry-per-day indexes.
+
+    Runs in order, in one transaction:
+    - adds the column if missing; every existing row starts as 'daily';
+    - marks the rows logged with workout_session as 'session': rows with
+      exercises, and rows that share a day with others and leave every
+      daily tracking column empty;
+    - merges the daily rows still sharing a day, and the duplicate health
+      surveys and mental wellness entries;
+    - only then creates the unique (user_id, date) indexes.
+
+    Returns the number of rows merged away. The caller commits.
+    """
+    connection = db.session.connection()
+    columns = {column['name'] for column in db.inspect(connection).get_columns('fitness_metrics')}
+    if 'entry_type' not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE fitness_metrics ADD COLUMN entry_type VARCHAR(20) NOT NULL DEFAULT 'daily'"
+        )
+
+    daily = FitnessMetric.entry_type == 'daily'
+    db.session.execute(
+        db.update(FitnessMetric)
+        .where(daily, db.select(Exercise.id).where(Exercise.metric_id == FitnessMetric.id).exists())
+        .values(entry_type='session')
+        .execution_options(synchronize_session=False)
+    )
+    shared_days = db.select(FitnessMetric.user_id, FitnessMetric.date).where(daily)\
+        .group_by(FitnessMetric.user_id, FitnessMetric.date)\
+        .having(db.func.count() > 1).subquery()
+    db.session.execute(
+        db.update(FitnessMetric)
+        .where(daily,
+               db.tuple_(FitnessMetric.user_id, FitnessMetric.date).in_(db.select(shared_days)),
+               *[getattr(FitnessMetric, name).is_(None) for name in _DAILY_ONLY])
+        .values(entry_type='session')
+        .execution_options(synchronize_session=False)
+    )
+
+    merged = merge_duplicate_days(FitnessMetric, daily)
+    merged += merge_duplicate_days(HealthSurvey)
+    merged += merge_duplicate_days(MentalWellness)
+
+    for model in (FitnessMetric, HealthSurvey, MentalWellness):
+        for index in model.__table__.indexes:
+            if index.unique:
+                index.create(connection, checkfirst=True)
+    return merged
+
+
+def merge_duplicate_days(model, where=None):
+    """Merge the rows of `model` that share a (user_id, date) into the newest one.
+
+    The newest row keeps its values and takes the non-empty values of the
+    older rows where its own are empty; rows of other tables referring to
+    the older rows are moved to it. The affected days are re-summarized
+    when the daily summary table exists. Returns the number of rows removed.
+    """
+    conditions = [where] if where is not None else []
+    days = db.session.execute(
+        db.select(model.user_id, model.date).where(*conditions)
+        .group_by(model.user_id, model.date).having(db.func.count() > 1)
+    ).all()
+
+    table = model.__table__
+    # Columns added by later migrations may not exist yet
+    inspector = db.inspect(db.session.connection())
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    columns = [column for column in table.columns if column.name in existing]
+    names = [column.name for column in columns
+             if not column.primary_key and column.computed is None]
+    referring = [(other, key.parent) for other in db.metadata.sorted_tables
+                 for key in other.foreign_keys if key.column is table.c.id]
+
+    summarize = inspector.has_table(UserDailySummary.__tablename__)
+    removed = 0
+    for user_id, day in days:
+        rows = db.session.execute(
+            db.select(*columns).where(table.c.user_id == user_id, table.c.date == day, *conditions)
+            .order_by(table.c.id.desc())
+        ).all()
+        keep, older = rows[0], rows[1:]
+        values = {name: next((getattr(row, name) for row in older
+                              if getattr(row, name) is not None), None)
+                  for name in names if getattr(keep, name) is None}
+        values = {name: value for name, value in values.items() if value is not None}
+        if values:
+            db.session.execute(db.update(table).where(table.c.id == keep.id).values(values))
+
+        older_ids = [row.id for row in older]
+        for other, column in referring:
+            db.session.execute(db.update(other).where(column.in_(older_ids))
+                               .values({column.name: keep.id}))
+        db.session.execute(db.delete(table).where(table.c.id.in_(older_ids)))
+        if summarize:
+            refresh_daily_summary(user_id, day)
+        removed += len(older_ids)
+    return removed
+
+
+def backfill_daily_summaries(user_id):
+    """Rebuild the daily summary rows of a user over their whole history.
+
+    Returns the number of summary rows written. The caller commits.
+    """
+    bounds = db.union_all(*[
+        db.select(db.func.min(model.date).label('first'), db.func.max(model.date).label('last'))
+        .where(model.user_id == user_id)
+        for model in (MentalWellness, HealthSurvey, FitnessMetric)
+    ]).subquery()
+    first, last = db.session.execute(
+        db.select(db.func.min(bounds.c.first), db.func.max(bounds.c.last))
+    ).one()
+    if first is None:
+        return 0
+    refresh_daily_summary_range(user_id, first, last)
+    return db.session.execute(
+        db.select(db.func.count()).select_from(UserDailySummary)
+        .where(UserDailySummary.user_id == user_id)
+    ).scalar()
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from app import db
+from app.modules.fitness.models import FitnessMetric
+from app.modules.fitness.services import week_bounds
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+@dataclass(frozen=True)
+class SeriesPoint:
+    """Activity totals for one period of the analytics series."""
+    period: date
+    entries: int
+    steps: int
+    distance: float
+    active_minutes: int
+    calories_burned: int
+    workout_duration: int
+
+
+@dataclass(frozen=True)
+class FitnessAnalytics:
+    """Result of `compute_analytics` for one user and date range."""
+    start_date: date
+    end_date: date
+    granularity: str
+    workouts_by_type: List[Tuple[str, int]]
+    current_week_minutes: int
+    prev_week_minutes: int
+    series: List[SeriesPoint]
+
+
+def compute_analytics(user_id, start_date, end_date, granularity='day', today=None):
+    """Compute fitness analytics for a date range in a single pass.
+
+    One statement scans the user's rows in the range (plus the previous and
+    current week) and groups them by GROUPING SETS: per workout type for the
+    breakdown, per `date_trunc(granularity)` period for the series, and once
+    overall for the week-over-week minutes, which use FILTER clauses.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    current_week_start, _ = week_bounds(today)
+    prev_week_start = current_week_start - timedelta(days=7)
+
+    func = db.func
+    in_range = FitnessMetric.date.between(start_date, end_date)
+    # Inline the (whitelisted) unit so the SELECT and GROUP BY expressions match
+    unit = db.literal_column(f"'{granularity}'")
+    period = db.cast(func.date_trunc(unit, FitnessMetric.date), db.Date)
+
+    def total(column):
+        return func.coalesce(func.sum(column).filter(in_range), 0)
+
+    stmt = db.select(
+        func.grouping(FitnessMetric.workout_type).label('by_type'),
+        func.grouping(period).label('by_period'),
+        FitnessMetric.workout_type,
+        period.label('period'),
+        func.count(FitnessMetric.id).filter(in_range).label('entries'),
+        total(FitnessMetric.steps).label('steps'),
+        total(FitnessMetric.distance).label('distance'),
+        total(FitnessMetric.active_minutes).label('active_minutes'),
+        total(FitnessMetric.calories_burned).label('calories_burned'),
+        total(FitnessMetric.workout_duration).label('workout_duration'),
+        func.coalesce(func.sum(FitnessMetric.workout_duration).filter(
+            FitnessMetric.date >= current_week_start
+        ), 0).label('current_week_minutes'),
+        func.coalesce(func.sum(FitnessMetric.workout_duration).filter(
+            FitnessMetric.date >= prev_week_start,
+            FitnessMetric.date < current_week_start
+        ), 0).label('prev_week_minutes')
+    ).where(
+        FitnessMetric.user_id == user_id,
+        db.or_(in_range, FitnessMetric.date >= prev_week_start)
+    ).group_by(
+        func.grouping_sets(
+            db.tuple_(FitnessMetric.workout_type),
+            db.tuple_(period),
+            db.tuple_()
+        )
+    )
+
+    workouts_by_type = []
+    series = []
+    current_week_minutes = prev_week_minutes = 0
+    for row in db.session.execute(stmt):
+        if row.by_type and row.by_period:
+            current_week_minutes = int(row.current_week_minutes)
+            prev_week_minutes = int(row.prev_week_minutes)
+        elif not row.by_type:
+            if row.workout_type and row.entries:
+                workouts_by_type.append((row.workout_type, row.entries))
+        elif row.entries:
+            series.append(SeriesPoint(
+                period=row.period,
+                entries=row.entries,
+                steps=int(row.steps),
+                distance=float(row.distance),
+                active_minutes=int(row.active_minutes),
+                calories_burned=int(row.calories_burned),
+                workout_duration=int(row.workout_duration)
+            ))
+
+    workouts_by_type.sort(key=lambda item: item[1], reverse=True)
+    series.sort(key=lambda point: point.period)
+
+    return FitnessAnalytics(
+        start_date=start_date,
+        end_date=end_date,
+        granularity=granularity,
+        workouts_by_type=workouts_by_type,
+        current_week_minutes=current_week_minutes,
+        prev_week_minutes=prev_week_minutes,
+        series=series
+    )
+
+
+def parse_range(args, default_days=30):
+    """Read start_date, end_date and granularity from request arguments.
+
+    Returns ``(start_date, end_date, granularity)``; raises ValueError on
+    malformed dates, an inverted range or an unknown granularity.
+    """
+    today = datetime.utcnow().date()
+    end_date = _parse_date(args.get('end_date')) or today
+    start_date = _parse_date(args.get('start_date')) or end_date - timedelta(days=default_days)
+    granularity = args.get('granularity') or 'day'
+
+    if start_date > end_date:
+        raise ValueError('start_date is after end_date')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+    return start_date, end_date, granularity
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
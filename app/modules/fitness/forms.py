@@ -68,6 +68,10 @@ class FitnessMetricForm(FlaskForm):
 
 class ExerciseEntryForm(FlaskForm):
     """Form for individual exercise within a workout."""
+    class Meta:
+        # Nested in WorkoutSessionForm, which carries the CSRF token
+        csrf = False
+    
     name = StringField(_l('Exercise Name'), validators=[DataRequired()])
     sets = IntegerField(_l('Sets'), validators=[Optional(), NumberRange(min=0)])
     reps = IntegerField(_l('Reps'), validators=[Optional(), NumberRange(min=0)])
@@ -100,22 +104,8 @@ class WorkoutSessionForm(FlaskForm):
     
     notes = TextAreaField(_l('Session Notes'), validators=[Optional()])
     
-    # In a real application, you would use FieldList and FormField for exercises
-    # For simplicity, we'll use separate fields for a few exercises
-    exercise1_name = StringField(_l('Exercise 1'))
-    exercise1_sets = IntegerField(_l('Sets'), validators=[Optional(), NumberRange(min=0)])
-    exercise1_reps = IntegerField(_l('Reps'), validators=[Optional(), NumberRange(min=0)])
-    exercise1_weight = FloatField(_l('Weight (kg)'), validators=[Optional(), NumberRange(min=0)])
-    
-    exercise2_name = StringField(_l('Exercise 2'))
-    exercise2_sets = IntegerField(_l('Sets'), validators=[Optional(), NumberRange(min=0)])
-    exercise2_reps = IntegerField(_l('Reps'), validators=[Optional(), NumberRange(min=0)])
-    exercise2_weight = FloatField(_l('Weight (kg)'), validators=[Optional(), NumberRange(min=0)])
-    
-    exercise3_name = StringField(_l('Exercise 3'))
-    exercise3_sets = IntegerField(_l('Sets'), validators=[Optional(), NumberRange(min=0)])
-    exercise3_reps = IntegerField(_l('Reps'), validators=[Optional(), NumberRange(min=0)])
-    exercise3_weight = FloatField(_l('Weight (kg)'), validators=[Optional(), NumberRange(min=0)])
+    # Variable-length list of exercises, submitted as exercises-<n>-<field>
+    exercises = FieldList(FormField(ExerciseEntryForm), min_entries=0, max_entries=100)
     
     submit = SubmitField(_l('Save Workout'))
 
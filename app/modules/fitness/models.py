@@ -4,11 +4,21 @@ from app import db
 class FitnessMetric(db.Model):
     """Model for fitness tracking."""
     __tablename__ = 'fitness_metrics'
+    __table_args__ = (
+        # Includes id so keyset pagination on (date, id) is a pure index range
+        db.Index('ix_fitness_metrics_user_date', 'user_id', 'date', 'id'),
+        # One daily entry per user and day; workout sessions are not limited
+        db.Index('uq_fitness_metrics_user_date_daily', 'user_id', 'date', unique=True,
+                 postgresql_where=db.text("entry_type = 'daily'"),
+                 sqlite_where=db.text("entry_type = 'daily'")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     date = db.Column(db.Date, default=datetime.utcnow().date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    entry_type = db.Column(db.String(20), nullable=False, default='daily',
+                           server_default='daily')  # 'daily' (track) or 'session' (workout_session)
     
     # Activity metrics
     steps = db.Column(db.Integer)
@@ -29,18 +39,61 @@ class FitnessMetric(db.Model):
     recovery_score = db.Column(db.Integer)  # scale 1-10
     soreness_level = db.Column(db.Integer)  # scale 1-10
     
-    # Notes
-    workout_notes = db.Column(db.Text)
+    # Notes (deferred: only loaded by views that display them)
+    workout_notes = db.deferred(db.Column(db.Text), group='text')
+    
+    # Exercises logged during a workout session
+    exercises = db.relationship('Exercise', backref='metric', lazy='dynamic')
+    
+    # Columns loaded by each view, see app.utils.loading.load_profile
+    LOAD_PROFILES = {
+        'overview': ('date', 'entry_type', 'steps', 'distance', 'active_minutes',
+                     'calories_burned', 'workout_type', 'workout_duration'),
+        'history': ('date', 'entry_type', 'steps', 'distance', 'active_minutes',
+                    'calories_burned', 'workout_type', 'workout_duration',
+                    'workout_intensity', 'heart_rate_avg', 'heart_rate_max'),
+        'detail': 'full'
+    }
     
     def __repr__(self):
         return f'<FitnessMetric {self.user_id} on {self.date} - {self.workout_type}>'
 
+class HeartRateChunk(db.Model):
+    """Block of heart-rate samples recorded during a workout session.
+    
+    Samples are stored as compressed, delta-encoded arrays instead of one row
+    per reading; see app.modules.fitness.samples for the encoding.
+    """
+    __tablename__ = 'heart_rate_chunks'
+    __table_args__ = (
+        # Also serves loading all chunks of a session in order
+        db.UniqueConstraint('metric_id', 'seq', name='uq_heart_rate_chunks_metric_seq'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    metric_id = db.Column(db.Integer, db.ForeignKey('fitness_metrics.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # position of the chunk in the session
+    start_time = db.Column(db.DateTime, nullable=False)  # time of the first sample
+    sample_count = db.Column(db.Integer, nullable=False)
+    
+    # Summary of the chunk, readable without decoding it
+    bpm_min = db.Column(db.SmallInteger)
+    bpm_max = db.Column(db.SmallInteger)
+    bpm_avg = db.Column(db.Float)
+    
+    # zlib-compressed little-endian arrays of first-order differences
+    offsets = db.Column(db.LargeBinary, nullable=False)  # int32 ms since start_time
+    bpm = db.Column(db.LargeBinary, nullable=False)  # int16 beats per minute
+    
+    def __repr__(self):
+        return f'<HeartRateChunk {self.metric_id}#{self.seq} - {self.sample_count} samples>'
+
 class WorkoutPlan(db.Model):
     """Model for workout plans."""
     __tablename__ = 'workout_plans'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -56,7 +109,7 @@ class PlannedWorkout(db.Model):
     __tablename__ = 'planned_workouts'
     
     id = db.Column(db.Integer, primary_key=True)
-    plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=False)
+    plan_id = db.Column(db.Integer, db.ForeignKey('workout_plans.id'), nullable=False, index=True)
     day_of_week = db.Column(db.Integer)  # 0=Monday, 6=Sunday
     workout_type = db.Column(db.String(50))
     duration = db.Column(db.Integer)  # in minutes
@@ -69,11 +122,16 @@ class PlannedWorkout(db.Model):
         return f'<PlannedWorkout {self.workout_type} - Day {self.day_of_week}>'
 
 class Exercise(db.Model):
-    """Model for exercises within a workout."""
+    """Model for exercises within a planned workout or a logged session."""
     __tablename__ = 'exercises'
+    __table_args__ = (
+        # Belongs to exactly one of a planned workout or a session metric
+        db.CheckConstraint('(workout_id IS NULL) <> (metric_id IS NULL)', name='ck_exercises_parent'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    workout_id = db.Column(db.Integer, db.ForeignKey('planned_workouts.id'), nullable=False)
+    workout_id = db.Column(db.Integer, db.ForeignKey('planned_workouts.id'), index=True)
+    metric_id = db.Column(db.Integer, db.ForeignKey('fitness_metrics.id'), index=True)
     name = db.Column(db.String(100), nullable=False)
     sets = db.Column(db.Integer)
     reps = db.Column(db.Integer)
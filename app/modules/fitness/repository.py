@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import groupby
+from typing import Optional, Tuple
+
+from app import db
+from app.modules.fitness.models import WorkoutPlan, PlannedWorkout, Exercise
+
+DAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+@dataclass(frozen=True)
+class ExerciseView:
+    """Read-only exercise of a planned workout."""
+    id: int
+    name: str
+    sets: Optional[int]
+    reps: Optional[int]
+    weight: Optional[float]
+    duration: Optional[int]
+    notes: Optional[str]
+
+
+@dataclass(frozen=True)
+class PlannedWorkoutView:
+    """Read-only planned workout with its exercises."""
+    id: int
+    day_of_week: Optional[int]
+    workout_type: Optional[str]
+    duration: Optional[int]
+    description: Optional[str]
+    exercises: Tuple[ExerciseView, ...]
+
+    @property
+    def day_name(self):
+        return DAY_NAMES[self.day_of_week] if self.day_of_week is not None else None
+
+
+@dataclass(frozen=True)
+class PlanView:
+    """Read-only workout plan tree: plan, planned workouts and exercises."""
+    id: int
+    name: str
+    description: Optional[str]
+    created_at: datetime
+    workouts: Tuple[PlannedWorkoutView, ...]
+
+    def workout_for_day(self, day_of_week):
+        """Return the first workout planned on `day_of_week`, or None for a rest day."""
+        return next((workout for workout in self.workouts
+                     if workout.day_of_week == day_of_week), None)
+
+
+def get_plan(user_id):
+    """Load the user's workout plan with all workouts and exercises, or None.
+
+    The whole tree comes back from a single LEFT JOIN statement ordered by
+    day and id, and is folded into immutable views in Python, so rendering
+    a plan costs one query however many days and exercises it has.
+    """
+    plan_id = db.select(db.func.min(WorkoutPlan.id))\
+        .where(WorkoutPlan.user_id == user_id)\
+        .scalar_subquery()
+
+    stmt = db.select(
+        WorkoutPlan.id, WorkoutPlan.name, WorkoutPlan.description, WorkoutPlan.created_at,
+        PlannedWorkout.id.label('workout_id'), PlannedWorkout.day_of_week,
+        PlannedWorkout.workout_type, PlannedWorkout.duration.label('workout_duration'),
+        PlannedWorkout.description.label('workout_description'),
+        Exercise.id.label('exercise_id'), Exercise.name.label('exercise_name'),
+        Exercise.sets, Exercise.reps, Exercise.weight, Exercise.duration.label('exercise_duration'),
+        Exercise.notes
+    ).select_from(
+        WorkoutPlan.__table__
+        .outerjoin(PlannedWorkout, PlannedWorkout.plan_id == WorkoutPlan.id)
+        .outerjoin(Exercise, Exercise.workout_id == PlannedWorkout.id)
+    ).where(
+        WorkoutPlan.id == plan_id
+    ).order_by(
+        PlannedWorkout.day_of_week, PlannedWorkout.id, Exercise.id
+    )
+
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return None
+
+    workouts = []
+    for workout_id, workout_rows in groupby(rows, key=lambda row: row.workout_id):
+        if workout_id is None:
+            continue
+        workout_rows = list(workout_rows)
+        first = workout_rows[0]
+        workouts.append(PlannedWorkoutView(
+            id=workout_id,
+            day_of_week=first.day_of_week,
+            workout_type=first.workout_type,
+            duration=first.workout_duration,
+            description=first.workout_description,
+            exercises=tuple(
+                ExerciseView(row.exercise_id, row.exercise_name, row.sets, row.reps,
+                             row.weight, row.exercise_duration, row.notes)
+                for row in workout_rows if row.exercise_id is not None
+            )
+        ))
+
+    plan = rows[0]
+    return PlanView(plan.id, plan.name, plan.description, plan.created_at, tuple(workouts))
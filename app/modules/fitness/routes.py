@@ -1,10 +1,21 @@
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
+from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.modules.fitness.models import FitnessMetric, WorkoutPlan, PlannedWorkout, Exercise
+from app.core.rollup import refresh_daily_summary
+from app.utils.loading import load_profile
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.export import export_columns, export_response
+from app.utils.sql import upsert
+from app.modules.fitness import repository, samples, services
+from app.modules.fitness.analytics import compute_analytics, parse_range
+from app.modules.fitness.training_load import get_training_load
+from app.modules.fitness.models import (
+    FitnessMetric, WorkoutPlan, PlannedWorkout, Exercise, HeartRateChunk
+)
 from app.modules.fitness.forms import (
     FitnessMetricForm, WorkoutSessionForm, WorkoutPlanForm, FitnessFilterForm
 )
@@ -18,27 +29,15 @@ def index():
     """Fitness tracking overview."""
     # Get recent fitness entries
     recent_entries = FitnessMetric.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(FitnessMetric, 'overview'))\
         .order_by(FitnessMetric.date.desc())\
         .limit(7).all()
     
     # Calculate weekly totals
-    week_start = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    weekly_workouts = FitnessMetric.query.filter_by(user_id=current_user.id)\
-        .filter(FitnessMetric.date >= week_start, FitnessMetric.date <= week_end)\
-        .all()
+    weekly_stats = services.weekly_stats(current_user.id)
     
-    weekly_stats = {
-        'total_workouts': len(weekly_workouts),
-        'total_duration': sum(w.workout_duration or 0 for w in weekly_workouts),
-        'total_distance': sum(w.distance or 0 for w in weekly_workouts),
-        'total_calories': sum(w.calories_burned or 0 for w in weekly_workouts),
-        'total_steps': sum(w.steps or 0 for w in weekly_workouts)
-    }
-    
-    # Get active workout plan
-    workout_plan = WorkoutPlan.query.filter_by(user_id=current_user.id).first()
+    # Get active workout plan with its workouts and exercises
+    workout_plan = repository.get_plan(current_user.id)
     
     return render_template('fitness/index.html',
                            title=_('Fitness Tracking'),
@@ -57,49 +56,31 @@ def track():
         form.date.data = datetime.utcnow().date()
     
     if form.validate_on_submit():
-        # Check if an entry for this date already exists
-        existing_entry = FitnessMetric.query.filter_by(
+        # Insert the daily entry or update the existing one for this date
+        inserted = upsert(FitnessMetric, dict(
             user_id=current_user.id,
-            date=form.date.data
-        ).first()
+            date=form.date.data,
+            entry_type='daily',
+            steps=form.steps.data,
+            distance=form.distance.data,
+            active_minutes=form.active_minutes.data,
+            calories_burned=form.calories_burned.data,
+            workout_type=form.workout_type.data,
+            workout_duration=form.workout_duration.data,
+            workout_intensity=form.workout_intensity.data,
+            heart_rate_avg=form.heart_rate_avg.data,
+            heart_rate_max=form.heart_rate_max.data,
+            recovery_score=form.recovery_score.data,
+            soreness_level=form.soreness_level.data,
+            workout_notes=form.workout_notes.data
+        ), index_elements=['user_id', 'date'], index_where=FitnessMetric.entry_type == 'daily')
         
-        if existing_entry:
-            # Update existing entry
-            existing_entry.steps = form.steps.data
-            existing_entry.distance = form.distance.data
-            existing_entry.active_minutes = form.active_minutes.data
-            existing_entry.calories_burned = form.calories_burned.data
-            existing_entry.workout_type = form.workout_type.data
-            existing_entry.workout_duration = form.workout_duration.data
-            existing_entry.workout_intensity = form.workout_intensity.data
-            existing_entry.heart_rate_avg = form.heart_rate_avg.data
-            existing_entry.heart_rate_max = form.heart_rate_max.data
-            existing_entry.recovery_score = form.recovery_score.data
-            existing_entry.soreness_level = form.soreness_level.data
-            existing_entry.workout_notes = form.workout_notes.data
-            
-            flash(_('Fitness entry updated for the selected date.'), 'success')
-        else:
-            # Create new entry
-            entry = FitnessMetric(
-                user_id=current_user.id,
-                date=form.date.data,
-                steps=form.steps.data,
-                distance=form.distance.data,
-                active_minutes=form.active_minutes.data,
-                calories_burned=form.calories_burned.data,
-                workout_type=form.workout_type.data,
-                workout_duration=form.workout_duration.data,
-                workout_intensity=form.workout_intensity.data,
-                heart_rate_avg=form.heart_rate_avg.data,
-                heart_rate_max=form.heart_rate_max.data,
-                recovery_score=form.recovery_score.data,
-                soreness_level=form.soreness_level.data,
-                workout_notes=form.workout_notes.data
-            )
-            db.session.add(entry)
+        if inserted:
             flash(_('Fitness entry recorded.'), 'success')
+        else:
+            flash(_('Fitness entry updated for the selected date.'), 'success')
         
+        refresh_daily_summary(current_user.id, form.date.data)
         db.session.commit()
         return redirect(url_for('fitness.index'))
     
@@ -114,12 +95,14 @@ def history():
     filter_form = FitnessFilterForm()
     
     # Apply filters if provided
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 0, type=int) == 1
     start_date = request.args.get('start_date', None)
     end_date = request.args.get('end_date', None)
     workout_type = request.args.get('workout_type', None)
     
-    query = FitnessMetric.query.filter_by(user_id=current_user.id)
+    query = FitnessMetric.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(FitnessMetric, 'history'))
     
     if start_date:
         query = query.filter(FitnessMetric.date >= start_date)
@@ -128,8 +111,11 @@ def history():
     if workout_type:
         query = query.filter(FitnessMetric.workout_type == workout_type)
     
-    entries = query.order_by(FitnessMetric.date.desc())\
-        .paginate(page=page, per_page=10, error_out=False)
+    try:
+        entries = keyset_paginate(query, (FitnessMetric.date, FitnessMetric.id),
+                                  cursor=cursor, per_page=10, with_total=with_total)
+    except InvalidCursor:
+        return redirect(url_for('fitness.history'))
     
     return render_template('fitness/history.html',
                            title=_('Fitness History'),
@@ -147,20 +133,14 @@ def workout_session():
         form.date.data = datetime.utcnow().date()
     
     if form.validate_on_submit():
-        # First, create the fitness metric entry
-        metric = FitnessMetric(
-            user_id=current_user.id,
+        # Insert the session metric and its exercises in bulk
+        services.record_workout_session(current_user.id, dict(
             date=form.date.data,
             workout_type=form.workout_type.data,
             workout_duration=form.duration.data,
             workout_intensity=form.intensity.data,
             workout_notes=form.notes.data
-        )
-        db.session.add(metric)
-        
-        # In a real application, you would also create Exercise entries
-        # linked to this workout session
-        
+        ), [exercise.data for exercise in form.exercises])
         db.session.commit()
         flash(_('Workout session recorded.'), 'success')
         return redirect(url_for('fitness.index'))
@@ -175,10 +155,10 @@ def workout_plan():
     """Create or update workout plan."""
     form = WorkoutPlanForm()
     
-    # Get existing plan if any
-    existing_plan = WorkoutPlan.query.filter_by(user_id=current_user.id).first()
-    
     if form.validate_on_submit():
+        existing_plan = WorkoutPlan.query.filter_by(user_id=current_user.id)\
+            .order_by(WorkoutPlan.id).first()
+        
         if existing_plan:
             # Update existing plan
             existing_plan.name = form.name.data
@@ -205,13 +185,18 @@ def workout_plan():
         db.session.commit()
         return redirect(url_for('fitness.workout_plan'))
     
+    # Get existing plan if any, as a read-only tree
+    existing_plan = repository.get_plan(current_user.id)
+    
     # Pre-populate form with existing data
-    elif request.method == 'GET' and existing_plan:
+    if request.method == 'GET' and existing_plan:
         form.name.data = existing_plan.name
         form.description.data = existing_plan.description
         
-        # In a real application, you would also populate the workout types
-        # for each day based on the existing planned workouts
+        # Populate the workout type of each day from the planned workouts
+        for workout in existing_plan.workouts:
+            if workout.day_name and not form[f'{workout.day_name}_type'].data:
+                form[f'{workout.day_name}_type'].data = workout.workout_type
     
     return render_template('fitness/workout_plan.html',
                            title=_('Workout Plan'),
@@ -229,7 +214,10 @@ def delete_entry(id):
         flash(_('You do not have permission to delete this entry.'), 'danger')
         return redirect(url_for('fitness.history'))
     
+    db.session.execute(db.delete(Exercise).where(Exercise.metric_id == entry.id))
+    db.session.execute(db.delete(HeartRateChunk).where(HeartRateChunk.metric_id == entry.id))
     db.session.delete(entry)
+    refresh_daily_summary(current_user.id, entry.date)
     db.session.commit()
     flash(_('Fitness entry deleted.'), 'success')
     return redirect(url_for('fitness.history'))
@@ -238,7 +226,7 @@ def delete_entry(id):
 @login_required
 def edit_entry(id):
     """Edit a fitness metric entry."""
-    entry = FitnessMetric.query.get_or_404(id)
+    entry = FitnessMetric.query.options(*load_profile(FitnessMetric, 'detail')).get_or_404(id)
     
     # Check that user owns this entry
     if entry.user_id != current_user.id:
@@ -248,6 +236,7 @@ def edit_entry(id):
     form = FitnessMetricForm()
     
     if form.validate_on_submit():
+        previous_date = entry.date
         entry.date = form.date.data
         entry.steps = form.steps.data
         entry.distance = form.distance.data
@@ -262,7 +251,13 @@ def edit_entry(id):
         entry.soreness_level = form.soreness_level.data
         entry.workout_notes = form.workout_notes.data
         
-        db.session.commit()
+        try:
+            refresh_daily_summary(current_user.id, previous_date, entry.date)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(_('A fitness entry already exists for the selected date.'), 'danger')
+            return redirect(url_for('fitness.edit_entry', id=id))
         flash(_('Fitness entry updated.'), 'success')
         return redirect(url_for('fitness.history'))
     
@@ -290,51 +285,136 @@ def edit_entry(id):
 @login_required
 def analytics():
     """Fitness analytics and progress tracking."""
-    # Get data for the past 30 days
-    thirty_days_ago = datetime.utcnow().date() - timedelta(days=30)
-    
-    # Get workout counts by type
-    workouts_by_type = db.session.query(
-        FitnessMetric.workout_type, 
-        db.func.count(FitnessMetric.id)
-    ).filter(
-        FitnessMetric.user_id == current_user.id,
-        FitnessMetric.date >= thirty_days_ago,
-        FitnessMetric.workout_type.isnot(None)
-    ).group_by(
-        FitnessMetric.workout_type
-    ).all()
-    
-    # Get weekly workout minutes
-    current_week_start = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
-    prev_week_start = current_week_start - timedelta(days=7)
-    
-    current_week_minutes = db.session.query(
-        db.func.sum(FitnessMetric.workout_duration)
-    ).filter(
-        FitnessMetric.user_id == current_user.id,
-        FitnessMetric.date >= current_week_start,
-        FitnessMetric.workout_duration.isnot(None)
-    ).scalar() or 0
-    
-    prev_week_minutes = db.session.query(
-        db.func.sum(FitnessMetric.workout_duration)
-    ).filter(
-        FitnessMetric.user_id == current_user.id,
-        FitnessMetric.date >= prev_week_start,
-        FitnessMetric.date < current_week_start,
-        FitnessMetric.workout_duration.isnot(None)
-    ).scalar() or 0
-    
-    # Get daily activity data for charting
-    daily_activities = FitnessMetric.query.filter(
-        FitnessMetric.user_id == current_user.id,
-        FitnessMetric.date >= thirty_days_ago
-    ).order_by(FitnessMetric.date.asc()).all()
+    # Date range and granularity default to the past 30 days, per day
+    try:
+        start_date, end_date, granularity = parse_range(request.args)
+    except ValueError:
+        flash(_('Invalid analytics range.'), 'warning')
+        return redirect(url_for('fitness.analytics'))
+    
+    # Type breakdown, weekly minutes and the activity series in one query
+    result = compute_analytics(current_user.id, start_date, end_date, granularity)
+    
+    # Cached per user, only the days changed since the last view are recomputed
+    training_load = get_training_load(current_user.id).window(start_date, end_date)
     
     return render_template('fitness/analytics.html',
                            title=_('Fitness Analytics'),
-                           workouts_by_type=workouts_by_type,
-                           current_week_minutes=current_week_minutes,
-                           prev_week_minutes=prev_week_minutes,
-                           daily_activities=daily_activities)
\ No newline at end of file
+                           analytics=result,
+                           training_load=training_load,
+                           workouts_by_type=result.workouts_by_type,
+                           current_week_minutes=result.current_week_minutes,
+                           prev_week_minutes=result.prev_week_minutes,
+                           daily_activities=result.series)
+
+@fitness_bp.route('/api/weekly_stats')
+@login_required
+def api_weekly_stats():
+    """Weekly fitness totals as JSON."""
+    day = request.args.get('date', None)
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else None
+    except ValueError:
+        return jsonify(error=_('Invalid date, expected YYYY-MM-DD.')), 400
+    
+    stats = services.weekly_stats(current_user.id, day)
+    stats['week_start'] = stats['week_start'].isoformat()
+    stats['week_end'] = stats['week_end'].isoformat()
+    return jsonify(stats)
+
+@fitness_bp.route('/api/analytics')
+@login_required
+def api_analytics():
+    """Fitness analytics as JSON, for charts over arbitrary ranges."""
+    try:
+        start_date, end_date, granularity = parse_range(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    
+    result = compute_analytics(current_user.id, start_date, end_date, granularity)
+    return jsonify(
+        start_date=result.start_date.isoformat(),
+        end_date=result.end_date.isoformat(),
+        granularity=result.granularity,
+        workouts_by_type=dict(result.workouts_by_type),
+        current_week_minutes=result.current_week_minutes,
+        prev_week_minutes=result.prev_week_minutes,
+        series=[dict(point.__dict__, period=point.period.isoformat())
+                for point in result.series]
+    )
+
+@fitness_bp.route('/api/training_load')
+@login_required
+def api_training_load():
+    """Daily training load, ACWR, monotony and strain as JSON."""
+    try:
+        start_date, end_date, _granularity = parse_range(request.args, default_days=90)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    
+    training_load = get_training_load(current_user.id).window(start_date, end_date)
+    return jsonify(training_load.to_dict())
+
+@fitness_bp.route('/api/entries/<int:id>/heart_rate', methods=['GET'])
+@login_required
+def api_heart_rate(id):
+    """Heart-rate samples of a workout, downsampled for charts."""
+    entry = FitnessMetric.query.get_or_404(id)
+    if entry.user_id != current_user.id:
+        abort(404)
+    
+    points = min(max(request.args.get('points', 300, type=int), 1), 2000)
+    times, bpm = samples.load_samples(entry.id)
+    return jsonify(
+        sample_count=int(bpm.size),
+        points=samples.downsample(times, bpm, points)
+    )
+
+@fitness_bp.route('/api/entries/<int:id>/heart_rate', methods=['POST'])
+@login_required
+def api_upload_heart_rate(id):
+    """Store the heart-rate samples recorded during a workout.
+
+    Expects JSON with ``start_time`` (ISO 8601), ``bpm`` (list of readings)
+    and optionally ``offsets`` (seconds from start_time, default 1 Hz).
+    """
+    entry = FitnessMetric.query.get_or_404(id)
+    if entry.user_id != current_user.id:
+        abort(404)
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        chunks = samples.store_samples(entry, samples.parse_start_time(data['start_time']),
+                                       data['bpm'], data.get('offsets'))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+    
+    refresh_daily_summary(current_user.id, entry.date)
+    db.session.commit()
+    return jsonify(chunks=chunks, heart_rate_avg=entry.heart_rate_avg,
+                   heart_rate_max=entry.heart_rate_max), 201
+
+@fitness_bp.route('/export')
+@login_required
+def export():
+    """Download the fitness history as CSV or NDJSON, optionally gzipped."""
+    start_date = request.args.get('start_date', None)
+    end_date = request.args.get('end_date', None)
+    workout_type = request.args.get('workout_type', None)
+    
+    stmt = db.select(*export_columns(FitnessMetric))\
+        .where(FitnessMetric.user_id == current_user.id)\
+        .order_by(FitnessMetric.date, FitnessMetric.id)
+    
+    if start_date:
+        stmt = stmt.where(FitnessMetric.date >= start_date)
+    if end_date:
+        stmt = stmt.where(FitnessMetric.date <= end_date)
+    if workout_type:
+        stmt = stmt.where(FitnessMetric.workout_type == workout_type)
+    
+    try:
+        return export_response(stmt, 'fitness_history', request.args.get('format', 'csv'),
+                               compress=request.args.get('gzip', 0, type=int) == 1)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
@@ -0,0 +1,138 @@
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from app.modules.fitness.models import HeartRateChunk
+
+# Samples per stored chunk: one hour of 1 Hz readings
+CHUNK_SAMPLES = 3600
+
+_BPM_DTYPE = np.dtype('<i2')
+_OFFSET_DTYPE = np.dtype('<i4')
+
+
+def encode(values, dtype):
+    """Delta-encode an integer array and compress it with zlib.
+
+    Consecutive heart-rate readings and sample intervals barely change, so
+    the differences are mostly tiny repeated values that compress well.
+    """
+    deltas = np.diff(np.asarray(values, dtype=np.int64), prepend=0)
+    info = np.iinfo(dtype)
+    if deltas.size and (deltas.min() < info.min or deltas.max() > info.max):
+        raise ValueError(f'Sample deltas do not fit in {dtype}')
+    return zlib.compress(deltas.astype(dtype).tobytes())
+
+
+def decode(blob, dtype):
+    """Inverse of `encode`: view the decompressed buffer as an array and integrate."""
+    deltas = np.frombuffer(zlib.decompress(blob), dtype=dtype)
+    return np.cumsum(deltas, dtype=np.int64).astype(dtype.newbyteorder('='))
+
+
+def store_samples(metric, start_time, bpm, offsets=None):
+    """Replace the heart-rate samples of a workout session.
+
+    `bpm` holds the readings and `offsets` their times in seconds from
+    `start_time` (default: one reading per second). Samples are written as
+    chunks of CHUNK_SAMPLES with one executemany INSERT; the session's
+    average and maximum heart rate are filled in from them. The caller
+    commits. Returns the number of chunks written.
+    """
+    # Parsed as floats first, so that fractional readings are refused
+    # rather than silently truncated by the integer cast
+    bpm = np.asarray(bpm, dtype=np.float64)
+    if not np.all(np.isfinite(bpm)) or np.any(bpm != np.round(bpm)):
+        raise ValueError('Heart rate readings must be whole numbers')
+    if offsets is None:
+        offsets = np.arange(bpm.size, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.float64)
+    if not np.all(np.isfinite(offsets)):
+        raise ValueError('Sample offsets must be finite numbers')
+    if bpm.ndim != 1 or offsets.shape != bpm.shape:
+        raise ValueError('bpm and offsets must be flat arrays of the same length')
+    if bpm.size and (bpm.min() < 0 or bpm.max() > 300):
+        raise ValueError('Heart rate out of range')
+    bpm = bpm.astype(np.int64)
+    offsets_ms = np.round(offsets * 1000).astype(np.int64)
+    if np.any(np.diff(offsets_ms) < 0):
+        raise ValueError('Sample offsets must be increasing')
+
+    db.session.execute(db.delete(HeartRateChunk).where(HeartRateChunk.metric_id == metric.id))
+
+    rows = []
+    for seq, begin in enumerate(range(0, bpm.size, CHUNK_SAMPLES)):
+        chunk_bpm = bpm[begin:begin + CHUNK_SAMPLES]
+        chunk_offsets = offsets_ms[begin:begin + CHUNK_SAMPLES]
+        base = int(chunk_offsets[0])
+        rows.append(dict(
+            metric_id=metric.id,
+            seq=seq,
+            start_time=start_time + np.timedelta64(base, 'ms').item(),
+            sample_count=int(chunk_bpm.size),
+            bpm_min=int(chunk_bpm.min()),
+            bpm_max=int(chunk_bpm.max()),
+            bpm_avg=float(chunk_bpm.mean()),
+            offsets=encode(chunk_offsets - base, _OFFSET_DTYPE),
+            bpm=encode(chunk_bpm, _BPM_DTYPE)
+        ))
+    if rows:
+        db.session.execute(db.insert(HeartRateChunk), rows)
+        metric.heart_rate_avg = int(round(bpm.mean()))
+        metric.heart_rate_max = int(bpm.max())
+    return len(rows)
+
+
+def load_samples(metric_id):
+    """Decode all samples of a session.
+
+    Returns ``(times, bpm)``: a datetime64[ms] array and an int16 array,
+    both empty when the session has no samples.
+    """
+    chunks = db.session.execute(
+        db.select(HeartRateChunk.start_time, HeartRateChunk.offsets, HeartRateChunk.bpm)
+        .where(HeartRateChunk.metric_id == metric_id)
+        .order_by(HeartRateChunk.seq)
+    ).all()
+    if not chunks:
+        return np.array([], dtype='datetime64[ms]'), np.array([], dtype=np.int16)
+
+    times = np.concatenate([
+        np.datetime64(chunk.start_time, 'ms') + decode(chunk.offsets, _OFFSET_DTYPE).astype('timedelta64[ms]')
+        for chunk in chunks
+    ])
+    bpm = np.concatenate([decode(chunk.bpm, _BPM_DTYPE) for chunk in chunks])
+    return times, bpm
+
+
+def downsample(times, bpm, max_points=300):
+    """Reduce a series to at most `max_points` buckets for charting.
+
+    Samples are grouped into consecutive buckets of equal size; each bucket
+    keeps its first timestamp and the mean, minimum and maximum reading, so
+    spikes stay visible. Returns a list of dicts.
+    """
+    if bpm.size == 0:
+        return []
+    size = max(1, -(-bpm.size // max_points))
+    starts = np.arange(0, bpm.size, size)
+    values = bpm.astype(np.int64)
+    counts = np.diff(np.append(starts, bpm.size))
+    means = np.add.reduceat(values, starts) / counts
+    minimums = np.minimum.reduceat(values, starts)
+    maximums = np.maximum.reduceat(values, starts)
+    return [
+        {'time': time.item().isoformat(), 'avg': round(float(mean), 1),
+         'min': int(low), 'max': int(high)}
+        for time, mean, low, high in zip(times[starts], means, minimums, maximums)
+    ]
+
+
+def parse_start_time(value):
+    """Parse the ISO 8601 start time of an upload as a naive UTC datetime."""
+    start_time = datetime.fromisoformat(value)
+    if start_time.tzinfo is not None:
+        start_time = (start_time - start_time.utcoffset()).replace(tzinfo=None)
+    return start_time
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.core.models import UserDailySummary
+from app.core.rollup import refresh_daily_summary
+from app.modules.fitness.models import FitnessMetric, Exercise
+
+# Columns of the exercise dicts accepted by `record_workout_session`
+EXERCISE_FIELDS = ('name', 'sets', 'reps', 'weight', 'duration', 'notes')
+
+
+def week_bounds(day=None):
+    """Return the Monday and Sunday of the week containing `day` (default today)."""
+    day = day or datetime.utcnow().date()
+    week_start = day - timedelta(days=day.weekday())
+    return week_start, week_start + timedelta(days=6)
+
+
+def weekly_stats(user_id, day=None):
+    """Fitness totals for the week containing `day`, in one aggregate query.
+
+    The totals are summed over the daily rollup rows of the week (at most
+    seven), so the cost does not depend on how many entries were logged and
+    no ORM objects are built. Returns a plain dict suitable for templates
+    and JSON responses.
+    """
+    week_start, week_end = week_bounds(day)
+
+    func = db.func
+    totals = db.session.execute(db.select(
+        func.coalesce(func.sum(UserDailySummary.fitness_entries), 0).label('total_workouts'),
+        func.coalesce(func.sum(UserDailySummary.workout_duration), 0).label('total_duration'),
+        func.coalesce(func.sum(UserDailySummary.distance), 0).label('total_distance'),
+        func.coalesce(func.sum(UserDailySummary.calories_burned), 0).label('total_calories'),
+        func.coalesce(func.sum(UserDailySummary.steps), 0).label('total_steps'),
+        func.count(UserDailySummary.date).filter(UserDailySummary.fitness_entries > 0).label('active_days')
+    ).where(
+        UserDailySummary.user_id == user_id,
+        UserDailySummary.date.between(week_start, week_end)
+    )).one()
+
+    return {
+        'week_start': week_start,
+        'week_end': week_end,
+        'total_workouts': int(totals.total_workouts),
+        'total_duration': int(totals.total_duration),
+        'total_distance': float(totals.total_distance),
+        'total_calories': int(totals.total_calories),
+        'total_steps': int(totals.total_steps),
+        'active_days': totals.active_days
+    }
+
+
+
+def record_workout_session(user_id, session, exercises):
+    """Insert a workout session and all of its exercises; returns the metric id.
+
+    `session` holds the FitnessMetric column values (at least ``date``) and
+    `exercises` is a list of dicts keyed by EXERCISE_FIELDS. The metric row
+    is inserted with RETURNING and the exercises with one executemany
+    INSERT, so the statement count does not grow with the number of sets.
+    The daily rollup is refreshed; the caller commits.
+    """
+    metric_id = db.session.execute(
+        db.insert(FitnessMetric)
+        .values(user_id=user_id, entry_type='session', **session)
+        .returning(FitnessMetric.id)
+    ).scalar_one()
+
+    if exercises:
+        db.session.execute(db.insert(Exercise), [
+            dict({field: exercise.get(field) for field in EXERCISE_FIELDS}, metric_id=metric_id)
+            for exercise in exercises
+        ])
+
+    refresh_daily_summary(user_id, session['date'])
+    return metric_id
@@ -0,0 +1,238 @@
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from app import db
+from app.auth.models import User
+from app.core.rollup import changed_since
+from app.core.signals import entries_changed
+from app.modules.fitness.models import FitnessMetric
+from app.modules.health.models import HealthSurvey
+from app.utils.cache import TTLCache
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+# Heart-rate profile used when the user has no data to derive it from
+DEFAULT_HR_REST = 60
+DEFAULT_HR_MAX = 190
+
+# Banister TRIMP weighting factors (a * exp(b * heart rate reserve))
+_TRIMP_FACTORS = {'female': (0.86, 1.67)}
+_DEFAULT_TRIMP_FACTORS = (0.64, 1.92)
+
+_cache = TTLCache(maxsize=256, ttl=6 * 3600)
+
+
+@dataclass(frozen=True)
+class LoadSeries:
+    """Daily load and its rolling-window metrics, one value per day.
+
+    `acwr` is the acute (7 day) over chronic (28 day) average load ratio;
+    `monotony` is the 7 day mean divided by its standard deviation and
+    `strain` the 7 day total times monotony. Undefined values are NaN.
+    """
+    daily: np.ndarray
+    acute: np.ndarray
+    chronic: np.ndarray
+    acwr: np.ndarray
+    monotony: np.ndarray
+    strain: np.ndarray
+
+    def __getitem__(self, index):
+        return LoadSeries(*(getattr(self, name)[index] for name in self.__dataclass_fields__))
+
+
+@dataclass(frozen=True)
+class TrainingLoad:
+    """Training-load series of a user, from their first workout to today.
+
+    `srpe` is the session RPE load (minutes x intensity) and `trimp` the
+    heart-rate based Banister training impulse.
+    """
+    start: date
+    srpe: LoadSeries
+    trimp: LoadSeries
+
+    @property
+    def dates(self):
+        return np.arange(np.datetime64(self.start, 'D'),
+                         np.datetime64(self.start, 'D') + self.srpe.daily.size)
+
+    def to_dict(self):
+        """JSON-friendly form: ISO dates and lists, with None for NaN."""
+        def values(array):
+            return [None if np.isnan(value) else round(float(value), 3) for value in array]
+        return {
+            'dates': [str(day) for day in self.dates],
+            **{name: {field: values(getattr(series, field)) for field in series.__dataclass_fields__}
+               for name, series in (('srpe', self.srpe), ('trimp', self.trimp))}
+        }
+
+    def window(self, start_date, end_date):
+        """Restrict the series to the days between two dates (inclusive)."""
+        first = max((start_date - self.start).days, 0)
+        last = max((end_date - self.start).days + 1, first)
+        return TrainingLoad(self.start + timedelta(days=first),
+                            self.srpe[first:last], self.trimp[first:last])
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    load: TrainingLoad
+    profile: tuple
+    computed_at: datetime
+    dirty_from: Optional[date] = None
+
+
+def session_loads(duration, intensity, hr_avg, hr_rest, hr_max, factors=_DEFAULT_TRIMP_FACTORS):
+    """Per-session sRPE load and TRIMP for arrays of session values.
+
+    Missing values (NaN) contribute no load.
+    """
+    duration = np.nan_to_num(duration)
+    srpe = duration * np.nan_to_num(intensity)
+    reserve = np.clip((hr_avg - hr_rest) / (hr_max - hr_rest), 0, 1)
+    a, b = factors
+    trimp = np.nan_to_num(duration * reserve * a * np.exp(b * reserve))
+    return srpe, trimp
+
+
+def derive(daily, from_index=0, previous=None):
+    """Compute the rolling metrics of a daily load array.
+
+    When `previous` holds the metrics of an earlier version of the series,
+    only the days from `from_index` on are recomputed, using the preceding
+    CHRONIC_DAYS - 1 days as context, and spliced onto it.
+    """
+    offset = max(from_index - (CHRONIC_DAYS - 1), 0) if previous is not None else 0
+    values = daily[offset:]
+
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    squares = np.concatenate(([0.0], np.cumsum(values * values)))
+
+    def rolling(cumulative, window):
+        # Days before the first workout count as rest days; when recomputing
+        # a tail, the windows that reach before the context are discarded.
+        index = np.arange(1, values.size + 1)
+        return cumulative[index] - cumulative[np.maximum(index - window, 0)]
+
+    acute_sum = rolling(sums, ACUTE_DAYS)
+    acute = acute_sum / ACUTE_DAYS
+    chronic = rolling(sums, CHRONIC_DAYS) / CHRONIC_DAYS
+    variance = np.maximum(rolling(squares, ACUTE_DAYS) / ACUTE_DAYS - acute ** 2, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acwr = np.where(chronic > 0, acute / chronic, np.nan)
+        monotony = np.where(variance > 0, acute / np.sqrt(variance), np.nan)
+    series = LoadSeries(values, acute, chronic, acwr, monotony, acute_sum * monotony)
+
+    if previous is None:
+        return series
+    keep = from_index - offset
+    return LoadSeries(daily, *(
+        np.concatenate((getattr(previous, name)[:from_index], getattr(series, name)[keep:]))
+        for name in ('acute', 'chronic', 'acwr', 'monotony', 'strain')
+    ))
+
+
+def _profile(user_id, today):
+    """Resting and maximum heart rate and TRIMP factors of a user."""
+    user = db.session.get(User, user_id)
+    hr_max = DEFAULT_HR_MAX
+    if user is not None and user.date_of_birth:
+        hr_max = 220 - (today - user.date_of_birth).days // 365
+
+    hr_rest = db.session.execute(
+        db.select(db.func.avg(HealthSurvey.heart_rate))
+        .where(HealthSurvey.user_id == user_id,
+               HealthSurvey.date >= today - timedelta(days=90))
+    ).scalar()
+    factors = _TRIMP_FACTORS.get(user.gender if user is not None else None,
+                                 _DEFAULT_TRIMP_FACTORS)
+    return float(hr_rest or DEFAULT_HR_REST), float(hr_max), factors
+
+
+def _daily_loads(user_id, start, end, profile):
+    """Daily sRPE and TRIMP totals between two dates, in one query."""
+    rows = db.session.execute(
+        db.select(FitnessMetric.date, FitnessMetric.workout_duration,
+                  FitnessMetric.workout_intensity, FitnessMetric.heart_rate_avg)
+        .where(FitnessMetric.user_id == user_id, FitnessMetric.date >= start,
+               FitnessMetric.date <= end)
+    ).all()
+    length = (end - start).days + 1
+    if not rows:
+        return np.zeros(length), np.zeros(length)
+
+    index = np.array([(row.date - start).days for row in rows])
+    # None becomes NaN in float arrays
+    duration = np.array([row.workout_duration for row in rows], dtype=float)
+    intensity = np.array([row.workout_intensity for row in rows], dtype=float)
+    hr_avg = np.array([row.heart_rate_avg for row in rows], dtype=float)
+    hr_rest, hr_max, factors = profile
+    srpe, trimp = session_loads(duration, intensity, hr_avg, hr_rest, hr_max, factors)
+    return (np.bincount(index, weights=srpe, minlength=length),
+            np.bincount(index, weights=trimp, minlength=length))
+
+
+def _compute(user_id, today, profile):
+    first = db.session.execute(
+        db.select(db.func.min(FitnessMetric.date)).where(FitnessMetric.user_id == user_id)
+    ).scalar()
+    start = min(first or today, today)
+    srpe, trimp = _daily_loads(user_id, start, today, profile)
+    return TrainingLoad(start, derive(srpe), derive(trimp))
+
+
+def _extend(load, user_id, from_date, today, profile):
+    """Recompute `load` from `from_date` on and extend it to `today`."""
+    from_index = (from_date - load.start).days
+    srpe, trimp = _daily_loads(user_id, from_date, today, profile)
+    return TrainingLoad(
+        load.start,
+        derive(np.concatenate((load.srpe.daily[:from_index], srpe)), from_index, load.srpe),
+        derive(np.concatenate((load.trimp.daily[:from_index], trimp)), from_index, load.trimp)
+    )
+
+
+def get_training_load(user_id, today=None):
+    """Training-load series of a user, cached per process.
+
+    The first call computes the full history in one pass. Later calls reuse
+    the cached series and only refetch and recompute the days from the
+    earliest changed entry on: changes committed in this process arrive
+    through `entries_changed`, and changes from other processes are found
+    through the rollup's updated_at stamps.
+    """
+    today = today or datetime.utcnow().date()
+    now = datetime.utcnow()
+    entry = _cache.get(user_id)
+
+    if entry is None:
+        profile = _profile(user_id, today)
+        load = _compute(user_id, today, profile)
+    else:
+        profile = entry.profile
+        load = entry.load
+        changed = changed_since(user_id, entry.computed_at)
+        from_date = load.start + timedelta(days=load.srpe.daily.size)
+        for day in (entry.dirty_from, changed):
+            if day is not None and day < from_date:
+                from_date = day
+
+        if from_date < load.start:
+            load = _compute(user_id, today, profile)
+        elif from_date <= today:
+            load = _extend(load, user_id, from_date, today, profile)
+
+    _cache.set(user_id, _CacheEntry(load, profile, now))
+    return load
+
+
+@entries_changed.connect
+def _mark_dirty(user_id, first_date, **kw):
+    entry = _cache.get(user_id)
+    if entry is not None and (entry.dirty_from is None or first_date < entry.dirty_from):
+        _cache.set(user_id, replace(entry, dirty_from=first_date))
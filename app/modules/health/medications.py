@@ -0,0 +1,163 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from app import db
+from app.utils.sql import dialect_insert
+from app.modules.health.models import DoseEvent, Medication
+
+# Dose times for each scheduled frequency; 'as_needed' and 'other' have no slots
+DOSE_TIMES = {
+    'once_daily': (time(8),),
+    'twice_daily': (time(8), time(20)),
+    'three_times_daily': (time(8), time(14), time(20)),
+    'four_times_daily': (time(8), time(12), time(16), time(20)),
+}
+
+# Days of dose slots generated ahead of today
+SCHEDULE_DAYS = 7
+
+# A pending dose counts as missed this long after its scheduled time
+MISSED_AFTER = timedelta(hours=4)
+
+_COUNTERS = {'taken': 'doses_taken', 'skipped': 'doses_skipped', 'missed': 'doses_missed'}
+
+
+def create_medication(user_id, form, now=None):
+    """Add a medication from a MedicationForm and generate its first slots.
+
+    Slots start at the time the medication is recorded, so a course that
+    began earlier does not start with a backlog of missed doses. The caller
+    commits.
+    """
+    now = now or datetime.utcnow()
+    medication = Medication(
+        user_id=user_id,
+        name=form.name.data,
+        dosage=form.dosage.data,
+        frequency=form.frequency.data,
+        start_date=form.start_date.data,
+        end_date=form.end_date.data,
+        purpose=form.purpose.data,
+        notes=form.notes.data,
+        created_at=now,
+        scheduled_through=max(form.start_date.data, now.date()) - timedelta(days=1)
+    )
+    db.session.add(medication)
+    db.session.flush()
+    extend_schedules(now, medication_ids=[medication.id])
+    return medication
+
+
+def extend_schedules(now=None, user_id=None, medication_ids=None):
+    """Generate dose slots up to SCHEDULE_DAYS ahead for medications that need them.
+
+    Only medications whose schedule ends before the horizon are read, and
+    each gets at most SCHEDULE_DAYS of slots, so the work does not depend on
+    how long a prescription has been running. All slots are written with one
+    executemany INSERT; conflicts with slots another process generated first
+    are ignored. Returns the number of slots written.
+    """
+    now = now or datetime.utcnow()
+    horizon = now.date() + timedelta(days=SCHEDULE_DAYS)
+    query = Medication.query.filter(
+        Medication.frequency.in_(DOSE_TIMES),
+        Medication.scheduled_through < horizon,
+        db.or_(Medication.end_date.is_(None), Medication.end_date > Medication.scheduled_through)
+    )
+    if user_id is not None:
+        query = query.filter(Medication.user_id == user_id)
+    if medication_ids is not None:
+        query = query.filter(Medication.id.in_(medication_ids))
+
+    rows = []
+    for medication in query:
+        day = max(medication.scheduled_through + timedelta(days=1), medication.start_date)
+        last_day = min(horizon, medication.end_date or horizon)
+        while day <= last_day:
+            for dose_time in DOSE_TIMES[medication.frequency]:
+                scheduled_at = datetime.combine(day, dose_time)
+                if scheduled_at >= medication.created_at:
+                    rows.append(dict(medication_id=medication.id, user_id=medication.user_id,
+                                     scheduled_at=scheduled_at, status='pending'))
+            day += timedelta(days=1)
+        medication.scheduled_through = horizon
+
+    if rows:
+        insert = dialect_insert(DoseEvent).on_conflict_do_nothing(
+            index_elements=['medication_id', 'scheduled_at']
+        )
+        db.session.execute(insert, rows)
+    return len(rows)
+
+
+def mark_missed(now=None, user_id=None):
+    """Resolve pending doses past MISSED_AFTER as missed and update the counters.
+
+    One UPDATE over the pending-dose index returns the affected medications,
+    whose counters are then incremented with one executemany statement.
+    Returns the number of doses marked.
+    """
+    now = now or datetime.utcnow()
+    stmt = db.update(DoseEvent)\
+        .where(DoseEvent.status == 'pending', DoseEvent.scheduled_at < now - MISSED_AFTER)\
+        .values(status='missed')\
+        .returning(DoseEvent.medication_id)\
+        .execution_options(synchronize_session=False)
+    if user_id is not None:
+        stmt = stmt.where(DoseEvent.user_id == user_id)
+    missed = Counter(db.session.execute(stmt).scalars())
+
+    if missed:
+        table = Medication.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('medication_id'))
+            .values(doses_missed=table.c.doses_missed + db.bindparam('count')),
+            [dict(medication_id=medication_id, count=count) for medication_id, count in missed.items()]
+        )
+    return sum(missed.values())
+
+
+def record_dose(dose, status, now=None):
+    """Resolve a dose as taken or skipped, moving it between adherence counters.
+
+    A missed dose can still be recorded afterwards. The caller commits.
+    """
+    if status not in ('taken', 'skipped'):
+        raise ValueError(f'Invalid dose status: {status}')
+    if dose.status == status:
+        return
+
+    counters = {}
+    if dose.status in _COUNTERS:
+        counters[_COUNTERS[dose.status]] = getattr(Medication, _COUNTERS[dose.status]) - 1
+    counters[_COUNTERS[status]] = getattr(Medication, _COUNTERS[status]) + 1
+    db.session.execute(
+        db.update(Medication).where(Medication.id == dose.medication_id).values(**counters)
+        .execution_options(synchronize_session=False)
+    )
+
+    dose.status = status
+    dose.taken_at = (now or datetime.utcnow()) if status == 'taken' else None
+
+
+def delete_medication(medication):
+    """Delete a medication with its dose history. The caller commits."""
+    db.session.execute(db.delete(DoseEvent).where(DoseEvent.medication_id == medication.id))
+    db.session.delete(medication)
+
+
+def due_doses(start, end, user_id=None):
+    """Pending doses scheduled between two times, with their medication.
+
+    Reads the partial index on pending doses, so reminder lookups across
+    all users only touch the doses that are actually due.
+    """
+    query = db.session.query(DoseEvent, Medication)\
+        .join(Medication, Medication.id == DoseEvent.medication_id)\
+        .filter(DoseEvent.status == 'pending',
+                DoseEvent.scheduled_at >= start,
+                DoseEvent.scheduled_at < end)
+    if user_id is not None:
+        query = query.filter(DoseEvent.user_id == user_id)
+    return query.order_by(DoseEvent.scheduled_at).all()
@@ -1,9 +1,18 @@
+import math
 from datetime import datetime
 from app import db
 
 class HealthSurvey(db.Model):
     """Model for general health survey data."""
     __tablename__ = 'health_surveys'
+    __table_args__ = (
+        # One survey per user and day; also serves per-user date range scans
+        db.Index('uq_health_surveys_user_date', 'user_id', 'date', unique=True),
+        # "My flagged days" only ever reads the few flagged rows
+        db.Index('ix_health_surveys_flagged', 'user_id', 'date',
+                 postgresql_where=db.text('anomaly_flags <> 0'),
+                 sqlite_where=db.text('anomaly_flags <> 0')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -31,9 +40,126 @@ class HealthSurvey(db.Model):
     alcohol_consumption = db.Column(db.Boolean)
     smoking = db.Column(db.Boolean)
     
-    # Notes
-    symptoms = db.Column(db.Text)
+    # Vitals outside the user's usual range when recorded, one bit per
+    # vital (see app.modules.health.vitals)
+    anomaly_flags = db.Column(db.SmallInteger, nullable=False, default=0)
+    
+    # Notes (deferred: only loaded by views that display them)
+    symptoms = db.deferred(db.Column(db.Text), group='text')
+    notes = db.deferred(db.Column(db.Text), group='text')
+    
+    # Columns loaded by each view, see app.utils.loading.load_profile
+    LOAD_PROFILES = {
+        'overview': ('date', 'weight', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+                     'heart_rate', 'body_temperature', 'sleep_duration', 'energy_level',
+                     'stress_level', 'water_intake'),
+        'history': ('date', 'weight', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+                    'heart_rate', 'sleep_duration', 'sleep_quality', 'energy_level',
+                    'stress_level', 'water_intake', 'meal_quality', 'anomaly_flags'),
+        'flagged': ('date', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+                    'heart_rate', 'body_temperature', 'anomaly_flags'),
+        'detail': 'full'
+    }
+    
+    def __repr__(self):
+        return f'<HealthSurvey {self.user_id} on {self.date}>'
+
+class VitalsBaseline(db.Model):
+    """Running statistics of one vital sign of a user (Welford's algorithm).
+    
+    `mean` and `m2` (the sum of squared deviations from the mean) are
+    updated in constant time as readings are added, changed or removed, so
+    scoring a new reading never rescans the user's history.
+    """
+    __tablename__ = 'vitals_baselines'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def stddev(self):
+        """Sample standard deviation, or None with fewer than two readings."""
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1)) if self.count > 1 else None
+    
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def remove(self, value):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        previous_mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 -= (value - previous_mean) * (value - self.mean)
+        self.mean = previous_mean
+        self.count -= 1
+    
+    def __repr__(self):
+        return f'<VitalsBaseline {self.user_id} {self.metric} - {self.count} readings>'
+
+class Medication(db.Model):
+    """Medication taken by a user, with its dose schedule and adherence counters.
+    
+    Dose slots are generated ahead of time as DoseEvent rows, a few days at a
+    time (see app.modules.health.medications); `scheduled_through` is the last
+    day generated so far. The counters are updated whenever a dose is
+    resolved, so adherence never requires counting past doses.
+    """
+    __tablename__ = 'medications'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    dosage = db.Column(db.String(100), nullable=False)
+    frequency = db.Column(db.String(30), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)  # NULL while ongoing
+    purpose = db.Column(db.String(200))
     notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    scheduled_through = db.Column(db.Date)
+    doses_taken = db.Column(db.Integer, nullable=False, default=0)
+    doses_skipped = db.Column(db.Integer, nullable=False, default=0)
+    doses_missed = db.Column(db.Integer, nullable=False, default=0)
+    
+    @property
+    def adherence(self):
+        """Percentage of resolved doses that were taken, or None before the first one."""
+        resolved = self.doses_taken + self.doses_skipped + self.doses_missed
+        return 100.0 * self.doses_taken / resolved if resolved else None
+    
+    def __repr__(self):
+        return f'<Medication {self.name} for {self.user_id}>'
+
+class DoseEvent(db.Model):
+    """One scheduled dose of a medication and what became of it."""
+    __tablename__ = 'dose_events'
+    __table_args__ = (
+        # Makes schedule generation idempotent; also serves per-medication scans
+        db.UniqueConstraint('medication_id', 'scheduled_at', name='uq_dose_events_medication_time'),
+        # "Due now" lookups across all users only ever read pending doses
+        db.Index('ix_dose_events_pending', 'scheduled_at',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+        # The same lookups for one user, on the medications page
+        db.Index('ix_dose_events_user_pending', 'user_id', 'scheduled_at',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medication_id = db.Column(db.Integer, db.ForeignKey('medications.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    scheduled_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, taken, skipped, missed
+    taken_at = db.Column(db.DateTime)
     
     def __repr__(self):
-        return f'<HealthSurvey {self.user_id} on {self.date}>'
\ No newline at end of file
+        return f'<DoseEvent {self.medication_id} at {self.scheduled_at} - {self.status}>'
@@ -0,0 +1,127 @@
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from app import db
+from app.core.models import UserDailySummary
+from app.core.rollup import changed_since
+from app.core.signals import entries_changed
+from app.utils.cache import TTLCache
+
+# Trailing windows, in days ending today
+WINDOWS = (7, 30, 90)
+
+# Daily rollup columns summarized on the health overview
+METRICS = ('sleep_duration', 'sleep_quality', 'energy_level', 'stress_level',
+           'water_intake', 'weight')
+
+_cache = TTLCache(maxsize=1024, ttl=3600)
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    metrics: 'RollingMetrics'
+    computed_at: datetime
+
+
+@dataclass(frozen=True)
+class MetricStats:
+    """Statistics of one metric over one window; None when no day has a value."""
+    days: int
+    avg: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    stddev: Optional[float]
+
+
+@dataclass(frozen=True)
+class RollingMetrics:
+    """Health metric statistics over each trailing window, as of `as_of`."""
+    as_of: date
+    windows: Dict[int, Dict[str, MetricStats]]
+
+    def to_dict(self):
+        return {
+            'as_of': self.as_of.isoformat(),
+            'windows': {str(days): {name: stats.__dict__ for name, stats in metrics.items()}
+                        for days, metrics in self.windows.items()}
+        }
+
+
+def compute_rolling_metrics(user_id, today=None):
+    """Compute every window and metric in one aggregate query over the rollup.
+
+    The scan is bounded by the largest window, so the cost does not grow
+    with the length of the user's history. Each window is a FILTER clause on
+    the date; days without a value for a metric are NULL in the rollup and
+    left out of its aggregates, so averages divide by the days that have
+    the metric, not by the number of rows.
+    """
+    today = today or datetime.utcnow().date()
+    func = db.func
+    columns = []
+    for days in WINDOWS:
+        in_window = UserDailySummary.date > today - timedelta(days=days)
+        for name in METRICS:
+            value = UserDailySummary.__table__.c[name]
+            columns += [
+                func.count(value).filter(in_window).label(f'{name}_{days}_days'),
+                func.avg(value).filter(in_window).label(f'{name}_{days}_avg'),
+                func.min(value).filter(in_window).label(f'{name}_{days}_min'),
+                func.max(value).filter(in_window).label(f'{name}_{days}_max'),
+                func.sum(value * value).filter(in_window).label(f'{name}_{days}_squares')
+            ]
+
+    row = db.session.execute(
+        db.select(*columns)
+        .where(UserDailySummary.user_id == user_id,
+               UserDailySummary.date > today - timedelta(days=max(WINDOWS)),
+               UserDailySummary.date <= today,
+               UserDailySummary.health_entries > 0)
+    ).one()._mapping
+
+    windows = {}
+    for days in WINDOWS:
+        windows[days] = {}
+        for name in METRICS:
+            key = f'{name}_{days}'
+            count = row[f'{key}_days']
+            avg = float(row[f'{key}_avg']) if count else None
+            stddev = None
+            if count > 1:
+                # Sample standard deviation from the sum of squares
+                variance = (float(row[f'{key}_squares']) - count * avg * avg) / (count - 1)
+                stddev = math.sqrt(max(variance, 0.0))
+            windows[days][name] = MetricStats(
+                days=count,
+                avg=avg,
+                min=float(row[f'{key}_min']) if count else None,
+                max=float(row[f'{key}_max']) if count else None,
+                stddev=stddev
+            )
+    return RollingMetrics(today, windows)
+
+
+def get_rolling_metrics(user_id, today=None):
+    """Rolling health metrics of a user, cached per process until their entries change or the day ends.
+
+    Changes committed in this process drop the entry through
+    `entries_changed`; changes from other processes are found through the
+    rollup's updated_at stamps within the largest window.
+    """
+    today = today or datetime.utcnow().date()
+    now = datetime.utcnow()
+    entry = _cache.get(user_id)
+    if entry is not None and entry.metrics.as_of == today:
+        if changed_since(user_id, entry.computed_at, after=today - timedelta(days=max(WINDOWS))) is None:
+            return entry.metrics
+
+    metrics = compute_rolling_metrics(user_id, today)
+    _cache.set(user_id, _CacheEntry(metrics, now))
+    return metrics
+
+
+@entries_changed.connect
+def _invalidate(user_id, **kw):
+    _cache.pop(user_id)
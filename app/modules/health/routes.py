@@ -1,10 +1,18 @@
-from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from datetime import datetime, time, timedelta
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
+from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.modules.health.models import HealthSurvey
+from app.core.rollup import refresh_daily_summary
+from app.utils.loading import load_profile
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.export import export_columns, export_response
+from app.utils.sql import upsert
+from app.modules.health import medications as medication_service, vitals
+from app.modules.health.models import DoseEvent, HealthSurvey, Medication
+from app.modules.health.rolling import get_rolling_metrics
 from app.modules.health.forms import HealthSurveyForm, HealthSurveyFilterForm, MedicationForm
 
 # Create blueprint
@@ -16,16 +24,14 @@ def index():
     """Health tracking overview."""
     # Get recent health survey entries
     recent_entries = HealthSurvey.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(HealthSurvey, 'overview'))\
         .order_by(HealthSurvey.date.desc())\
         .limit(7).all()
     
-    # Calculate averages for key metrics (last 7 days)
-    avg_data = {}
-    if recent_entries:
-        avg_data['sleep_duration'] = sum(entry.sleep_duration or 0 for entry in recent_entries) / len(recent_entries)
-        avg_data['energy_level'] = sum(entry.energy_level or 0 for entry in recent_entries) / len(recent_entries)
-        avg_data['stress_level'] = sum(entry.stress_level or 0 for entry in recent_entries) / len(recent_entries)
-        avg_data['water_intake'] = sum(entry.water_intake or 0 for entry in recent_entries) / len(recent_entries)
+    # Averages, ranges and spread over the last 7, 30 and 90 days
+    rolling = get_rolling_metrics(current_user.id)
+    avg_data = {name: stats.avg for name, stats in rolling.windows[7].items()
+                if stats.avg is not None}
     
     # Get last entry for vital signs
     last_entry = recent_entries[0] if recent_entries else None
@@ -34,6 +40,7 @@ def index():
                            title=_('Health Tracking'),
                            recent_entries=recent_entries,
                            avg_data=avg_data,
+                           rolling=rolling,
                            last_entry=last_entry)
 
 @health_bp.route('/track', methods=['GET', 'POST'])
@@ -47,55 +54,45 @@ def track():
         form.date.data = datetime.utcnow().date()
     
     if form.validate_on_submit():
-        # Check if an entry for this date already exists
-        existing_entry = HealthSurvey.query.filter_by(
-            user_id=current_user.id,
-            date=form.date.data
+        # Score the vitals against the user's baseline, replacing the
+        # readings of an existing entry for this date
+        previous = db.session.execute(
+            db.select(*[getattr(HealthSurvey, name) for name in vitals.VITALS])
+            .where(HealthSurvey.user_id == current_user.id, HealthSurvey.date == form.date.data)
+            .with_for_update()
         ).first()
+        flags = vitals.record_vitals(current_user.id,
+                                     {name: form[name].data for name in vitals.VITALS},
+                                     previous._asdict() if previous else None)
         
-        if existing_entry:
-            # Update existing entry
-            existing_entry.weight = form.weight.data
-            existing_entry.blood_pressure_systolic = form.blood_pressure_systolic.data
-            existing_entry.blood_pressure_diastolic = form.blood_pressure_diastolic.data
-            existing_entry.heart_rate = form.heart_rate.data
-            existing_entry.body_temperature = form.body_temperature.data
-            existing_entry.sleep_duration = form.sleep_duration.data
-            existing_entry.sleep_quality = form.sleep_quality.data
-            existing_entry.energy_level = form.energy_level.data
-            existing_entry.stress_level = form.stress_level.data
-            existing_entry.water_intake = form.water_intake.data
-            existing_entry.meal_quality = form.meal_quality.data
-            existing_entry.alcohol_consumption = form.alcohol_consumption.data
-            existing_entry.smoking = form.smoking.data
-            existing_entry.symptoms = form.symptoms.data
-            existing_entry.notes = form.notes.data
-            
-            flash(_('Health survey updated for the selected date.'), 'success')
-        else:
-            # Create new entry
-            entry = HealthSurvey(
-                user_id=current_user.id,
-                date=form.date.data,
-                weight=form.weight.data,
-                blood_pressure_systolic=form.blood_pressure_systolic.data,
-                blood_pressure_diastolic=form.blood_pressure_diastolic.data,
-                heart_rate=form.heart_rate.data,
-                body_temperature=form.body_temperature.data,
-                sleep_duration=form.sleep_duration.data,
-                sleep_quality=form.sleep_quality.data,
-                energy_level=form.energy_level.data,
-                stress_level=form.stress_level.data,
-                water_intake=form.water_intake.data,
-                meal_quality=form.meal_quality.data,
-                alcohol_consumption=form.alcohol_consumption.data,
-                smoking=form.smoking.data,
-                symptoms=form.symptoms.data,
-                notes=form.notes.data
-            )
-            db.session.add(entry)
+        # Insert the entry or update the existing one for this date
+        inserted = upsert(HealthSurvey, dict(
+            user_id=current_user.id,
+            date=form.date.data,
+            weight=form.weight.data,
+            blood_pressure_systolic=form.blood_pressure_systolic.data,
+            blood_pressure_diastolic=form.blood_pressure_diastolic.data,
+            heart_rate=form.heart_rate.data,
+            body_temperature=form.body_temperature.data,
+            sleep_duration=form.sleep_duration.data,
+            sleep_quality=form.sleep_quality.data,
+            energy_level=form.energy_level.data,
+            stress_level=form.stress_level.data,
+            water_intake=form.water_intake.data,
+            meal_quality=form.meal_quality.data,
+            alcohol_consumption=form.alcohol_consumption.data,
+            smoking=form.smoking.data,
+            symptoms=form.symptoms.data,
+            notes=form.notes.data,
+            anomaly_flags=flags
+        ), index_elements=['user_id', 'date'])
+        
+        if inserted:
             flash(_('Health survey recorded.'), 'success')
+        else:
+            flash(_('Health survey updated for the selected date.'), 'success')
         
+        refresh_daily_summary(current_user.id, form.date.data)
         db.session.commit()
         return redirect(url_for('health.index'))
     
@@ -110,25 +107,52 @@ def history():
     filter_form = HealthSurveyFilterForm()
     
     # Apply filters if provided
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 0, type=int) == 1
     start_date = request.args.get('start_date', None)
     end_date = request.args.get('end_date', None)
     
-    query = HealthSurvey.query.filter_by(user_id=current_user.id)
+    query = HealthSurvey.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(HealthSurvey, 'history'))
     
     if start_date:
         query = query.filter(HealthSurvey.date >= start_date)
     if end_date:
         query = query.filter(HealthSurvey.date <= end_date)
     
-    entries = query.order_by(HealthSurvey.date.desc())\
-        .paginate(page=page, per_page=10, error_out=False)
+    try:
+        entries = keyset_paginate(query, (HealthSurvey.date, HealthSurvey.id),
+                                  cursor=cursor, per_page=10, with_total=with_total)
+    except InvalidCursor:
+        return redirect(url_for('health.history'))
     
     return render_template('health/history.html',
                            title=_('Health Survey History'),
                            entries=entries,
                            filter_form=filter_form)
 
+@health_bp.route('/flagged')
+@login_required
+def flagged():
+    """Days whose vitals were outside the user's usual range."""
+    cursor = request.args.get('cursor', None)
+    
+    # Served by the partial index on flagged rows
+    query = HealthSurvey.query.filter(HealthSurvey.user_id == current_user.id,
+                                      HealthSurvey.anomaly_flags != 0)\
+        .options(*load_profile(HealthSurvey, 'flagged'))
+    
+    try:
+        entries = keyset_paginate(query, (HealthSurvey.date, HealthSurvey.id),
+                                  cursor=cursor, per_page=10)
+    except InvalidCursor:
+        return redirect(url_for('health.flagged'))
+    
+    return render_template('health/flagged.html',
+                           title=_('Flagged Vitals'),
+                           entries=entries,
+                           flag_names=vitals.flag_names)
+
 @health_bp.route('/medications', methods=['GET', 'POST'])
 @login_required
 def medications():
@@ -136,18 +160,62 @@ def medications():
     form = MedicationForm()
     
     if form.validate_on_submit():
-        # In a real app, you would save to a Medication model
-        # For this demo, we'll just show a success message
+        medication_service.create_medication(current_user.id, form)
+        db.session.commit()
         flash(_('Medication saved successfully.'), 'success')
         return redirect(url_for('health.medications'))
     
-    # In a real app, you would fetch medications from database
-    medications = []
+    # Bring the schedule up to date: a few days of new slots at most. Usually
+    # `flask reminders doses` already has, and nothing is written here.
+    now = datetime.utcnow()
+    changed = medication_service.extend_schedules(now, user_id=current_user.id)
+    changed += medication_service.mark_missed(now, user_id=current_user.id)
+    if changed or db.session.dirty:
+        db.session.commit()
+    
+    today = now.date()
+    medications = Medication.query.filter_by(user_id=current_user.id)\
+        .filter(db.or_(Medication.end_date.is_(None), Medication.end_date >= today))\
+        .order_by(Medication.name).all()
+    todays_doses = medication_service.due_doses(datetime.combine(today, time()),
+                                                datetime.combine(today + timedelta(days=1), time()),
+                                                user_id=current_user.id)
     
     return render_template('health/medications.html',
                            title=_('Medication Tracking'),
                            form=form,
-                           medications=medications)
+                           medications=medications,
+                           todays_doses=todays_doses)
+
+@health_bp.route('/medications/<int:id>/delete', methods=['POST'])
+@login_required
+def delete_medication(id):
+    """Delete a medication and its dose history."""
+    medication = Medication.query.get_or_404(id)
+    
+    if medication.user_id != current_user.id:
+        flash(_('You do not have permission to delete this medication.'), 'danger')
+        return redirect(url_for('health.medications'))
+    
+    medication_service.delete_medication(medication)
+    db.session.commit()
+    flash(_('Medication deleted.'), 'success')
+    return redirect(url_for('health.medications'))
+
+@health_bp.route('/doses/<int:id>/<any(taken, skipped):status>', methods=['POST'])
+@login_required
+def record_dose(id, status):
+    """Record a scheduled dose as taken or skipped."""
+    dose = DoseEvent.query.get_or_404(id)
+    
+    if dose.user_id != current_user.id:
+        flash(_('You do not have permission to update this dose.'), 'danger')
+        return redirect(url_for('health.medications'))
+    
+    medication_service.record_dose(dose, status)
+    db.session.commit()
+    flash(_('Dose recorded.'), 'success')
+    return redirect(url_for('health.medications'))
 
 @health_bp.route('/delete_entry/<int:id>', methods=['POST'])
 @login_required
@@ -160,7 +228,9 @@ def delete_entry(id):
         flash(_('You do not have permission to delete this entry.'), 'danger')
         return redirect(url_for('health.history'))
     
+    vitals.remove_vitals(current_user.id, vitals.vitals_of(entry))
     db.session.delete(entry)
+    refresh_daily_summary(current_user.id, entry.date)
     db.session.commit()
     flash(_('Health survey entry deleted.'), 'success')
     return redirect(url_for('health.history'))
@@ -169,7 +239,7 @@ def delete_entry(id):
 @login_required
 def edit_entry(id):
     """Edit a health survey entry."""
-    entry = HealthSurvey.query.get_or_404(id)
+    entry = HealthSurvey.query.options(*load_profile(HealthSurvey, 'detail')).get_or_404(id)
     
     # Check that user owns this entry
     if entry.user_id != current_user.id:
@@ -179,6 +249,10 @@ def edit_entry(id):
     form = HealthSurveyForm()
     
     if form.validate_on_submit():
+        previous_date = entry.date
+        entry.anomaly_flags = vitals.record_vitals(
+            current_user.id, {name: form[name].data for name in vitals.VITALS}, vitals.vitals_of(entry)
+        )
         entry.date = form.date.data
         entry.weight = form.weight.data
         entry.blood_pressure_systolic = form.blood_pressure_systolic.data
@@ -196,7 +270,13 @@ def edit_entry(id):
         entry.symptoms = form.symptoms.data
         entry.notes = form.notes.data
         
-        db.session.commit()
+        try:
+            refresh_daily_summary(current_user.id, previous_date, entry.date)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(_('A health survey already exists for the selected date.'), 'danger')
+            return redirect(url_for('health.edit_entry', id=id))
         flash(_('Health survey entry updated.'), 'success')
         return redirect(url_for('health.history'))
     
@@ -221,4 +301,32 @@ def edit_entry(id):
     
     return render_template('health/edit_entry.html',
                            title=_('Edit Health Survey'),
-                           form=form)
\ No newline at end of file
+                           form=form)
+
+@health_bp.route('/api/rolling_metrics')
+@login_required
+def api_rolling_metrics():
+    """7, 30 and 90 day health metric statistics as JSON."""
+    return jsonify(get_rolling_metrics(current_user.id).to_dict())
+
+@health_bp.route('/export')
+@login_required
+def export():
+    """Download the health survey history as CSV or NDJSON, optionally gzipped."""
+    start_date = request.args.get('start_date', None)
+    end_date = request.args.get('end_date', None)
+    
+    stmt = db.select(*export_columns(HealthSurvey))\
+        .where(HealthSurvey.user_id == current_user.id)\
+        .order_by(HealthSurvey.date, HealthSurvey.id)
+    
+    if start_date:
+        stmt = stmt.where(HealthSurvey.date >= start_date)
+    if end_date:
+        stmt = stmt.where(HealthSurvey.date <= end_date)
+    
+    try:
+        return export_response(stmt, 'health_history', request.args.get('format', 'csv'),
+                               compress=request.args.get('gzip', 0, type=int) == 1)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
@@ -0,0 +1,106 @@
+from app import db
+from app.modules.health.models import HealthSurvey, VitalsBaseline
+
+# Vital signs scored against the user's baseline, with their anomaly flag bit
+VITALS = ('blood_pressure_systolic', 'blood_pressure_diastolic', 'heart_rate', 'body_temperature')
+FLAGS = {name: 1 << bit for bit, name in enumerate(VITALS)}
+
+# Readings needed before a baseline is trusted to flag anything
+MIN_READINGS = 10
+
+# Flag readings this many standard deviations away from the user's mean
+Z_THRESHOLD = 3.0
+
+# Lower bound on the standard deviation, so that very regular readings do
+# not turn ordinary measurement noise into anomalies
+MIN_STDDEV = {
+    'blood_pressure_systolic': 4.0,
+    'blood_pressure_diastolic': 3.0,
+    'heart_rate': 3.0,
+    'body_temperature': 0.2,
+}
+
+
+def _load_baselines(user_id):
+    # Locked so concurrent submits of the same user apply their updates in turn
+    baselines = VitalsBaseline.query.filter_by(user_id=user_id).with_for_update().all()
+    return {baseline.metric: baseline for baseline in baselines}
+
+
+def is_anomaly(baseline, value):
+    """Whether `value` lies more than Z_THRESHOLD deviations from the baseline mean."""
+    if baseline is None or baseline.count < MIN_READINGS:
+        return False
+    stddev = max(baseline.stddev, MIN_STDDEV[baseline.metric])
+    return abs(value - baseline.mean) > Z_THRESHOLD * stddev
+
+
+def record_vitals(user_id, values, previous=None):
+    """Score a new or changed reading and fold it into the user's baselines.
+
+    `values` maps vital names to the new reading and `previous` to the
+    values it replaces, if any. The replaced values are removed from the
+    baselines first, so each reading is scored against the user's other
+    readings only. Costs one query for the baselines, whatever the length
+    of the history. Returns the anomaly flags of the reading; the caller
+    stores them with it and commits.
+    """
+    baselines = _load_baselines(user_id)
+    flags = 0
+    for name in VITALS:
+        baseline = baselines.get(name)
+        old = previous.get(name) if previous else None
+        if old is not None and baseline is not None:
+            baseline.remove(old)
+
+        value = values.get(name)
+        if value is None:
+            continue
+        if is_anomaly(baseline, value):
+            flags |= FLAGS[name]
+        if baseline is None:
+            baseline = VitalsBaseline(user_id=user_id, metric=name, count=0, mean=0.0, m2=0.0)
+            db.session.add(baseline)
+        baseline.add(value)
+    return flags
+
+
+def remove_vitals(user_id, values):
+    """Take a deleted reading out of the user's baselines. The caller commits."""
+    record_vitals(user_id, {}, previous=values)
+
+
+def rebuild_baselines(user_id):
+    """Recompute the user's baselines from all their readings in one query.
+
+    Used after bulk imports, which bypass the per-reading updates.
+    """
+    func = db.func
+    columns = []
+    for name in VITALS:
+        column = HealthSurvey.__table__.c[name]
+        columns += [func.count(column), func.avg(column), func.sum(column * column)]
+    row = db.session.execute(
+        db.select(*columns).where(HealthSurvey.user_id == user_id)
+    ).one()
+
+    baselines = _load_baselines(user_id)
+    for index, name in enumerate(VITALS):
+        count, mean, squares = row[3 * index:3 * index + 3]
+        baseline = baselines.get(name)
+        if baseline is None:
+            baseline = VitalsBaseline(user_id=user_id, metric=name)
+            db.session.add(baseline)
+        baseline.count = count
+        baseline.mean = float(mean or 0.0)
+        baseline.m2 = float(squares or 0.0) - count * baseline.mean ** 2 if count else 0.0
+
+
+def vitals_of(entry):
+    """The vital readings of a HealthSurvey row (or any object with those attributes)."""
+    return {name: getattr(entry, name) for name in VITALS}
+
+
+def flag_names(flags):
+    """Names of the vitals set in an anomaly bitmask."""
+    return [name for name in VITALS if flags & FLAGS[name]]
@@ -1,9 +1,51 @@
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
 from app import db
+from config import Config
+
+
+def regconfig_case(configs, default_language):
+    """SQL CASE mapping mental_wellness.language to a text search config."""
+    cases = ' '.join(f"WHEN '{language}' THEN '{name}'::regconfig"
+                     for language, name in configs.items())
+    return f"CASE language {cases} ELSE '{configs[default_language]}'::regconfig END"
+
+
+class SearchDocument(ColumnElement):
+    """Generation expression of mental_wellness.search_vector.
+
+    On PostgreSQL, the notes weighted by importance and parsed with the
+    text search config of the entry's language (FTS_CONFIGS; changing it
+    needs a migration). Other databases have no text search and store NULL.
+    """
+    inherit_cache = True
+
+
+@compiles(SearchDocument)
+def _compile_search_document(element, compiler, **kw):
+    return 'NULL'
+
+
+@compiles(SearchDocument, 'postgresql')
+def _compile_search_document_postgresql(element, compiler, **kw):
+    config = regconfig_case(Config.FTS_CONFIGS, Config.BABEL_DEFAULT_LOCALE)
+    return (f"setweight(to_tsvector({config}, coalesce(journal_entry, '')), 'A') || "
+            f"setweight(to_tsvector({config}, coalesce(triggers, '')), 'B') || "
+            f"setweight(to_tsvector({config}, coalesce(coping_strategies, '')), 'B')")
+
 
 class MentalWellness(db.Model):
     """Model for mental wellness tracking."""
     __tablename__ = 'mental_wellness'
+    __table_args__ = (
+        # One entry per user and day; also serves per-user date range scans
+        db.Index('uq_mental_wellness_user_date', 'user_id', 'date', unique=True),
+        # Full-text search of the notes, see app.modules.mental.search
+        db.Index('ix_mental_wellness_search', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -30,11 +72,37 @@ class MentalWellness(db.Model):
     financial_stress = db.Column(db.Boolean)
     relationship_stress = db.Column(db.Boolean)
     health_stress = db.Column(db.Boolean)
+    # The four flags above as one bitmask (bit order of
+    # app.modules.mental.stressors.STRESSORS), so stressor analytics group
+    # by a single small integer
+    stressor_mask = db.Column(db.SmallInteger, db.Computed(
+        '(CASE WHEN work_stress THEN 1 ELSE 0 END)'
+        ' + (CASE WHEN financial_stress THEN 2 ELSE 0 END)'
+        ' + (CASE WHEN relationship_stress THEN 4 ELSE 0 END)'
+        ' + (CASE WHEN health_stress THEN 8 ELSE 0 END)',
+        persisted=True
+    ))
+    
+    # Notes (deferred: only loaded by views that display them)
+    triggers = db.deferred(db.Column(db.Text), group='text')
+    coping_strategies = db.deferred(db.Column(db.Text), group='text')
+    journal_entry = db.deferred(db.Column(db.Text), group='text')
+    
+    # Language the notes are written in, selects the full-text search config
+    # (see app.modules.mental.search)
+    language = db.Column(db.String(5), nullable=False, default='en', server_default='en')
+    search_vector = db.deferred(db.Column(TSVECTOR().with_variant(db.Text(), 'sqlite'),
+                                          db.Computed(SearchDocument(), persisted=True)))
     
-    # Notes
-    triggers = db.Column(db.Text)
-    coping_strategies = db.Column(db.Text)
-    journal_entry = db.Column(db.Text)
+    # Columns loaded by each view, see app.utils.loading.load_profile
+    LOAD_PROFILES = {
+        'overview': ('date', 'mood_rating', 'anxiety_level', 'depression_level'),
+        'history': ('date', 'mood_rating', 'anxiety_level', 'depression_level',
+                    'focus_clarity', 'motivation', 'social_connection', 'meditation_minutes',
+                    'work_stress', 'financial_stress', 'relationship_stress', 'health_stress'),
+        'journal': ('date', 'journal_entry'),
+        'detail': 'full'
+    }
     
     def __repr__(self):
         return f'<MentalWellness {self.user_id} on {self.date} - Mood: {self.mood_rating}>'
@@ -42,6 +110,16 @@ class MentalWellness(db.Model):
 class TherapySession(db.Model):
     """Model for recording therapy sessions."""
     __tablename__ = 'therapy_sessions'
+    __table_args__ = (
+        # Session listing, newest first, paginated by (date, id)
+        db.Index('ix_therapy_sessions_user_date', 'user_id', 'date', 'id'),
+        # A user's upcoming follow-ups
+        db.Index('ix_therapy_sessions_user_follow_up', 'user_id', 'follow_up_date'),
+        # Follow-ups due soon across all users, for the reminder job
+        db.Index('ix_therapy_sessions_follow_up', 'follow_up_date',
+                 postgresql_where=db.text('follow_up_date IS NOT NULL'),
+                 sqlite_where=db.text('follow_up_date IS NOT NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,10 +1,20 @@
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
 
 from app import db
+from app.core.models import UserDailySummary
+from app.core.rollup import refresh_daily_summary
+from app.utils.loading import load_profile
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.export import export_columns, export_response
+from app.utils.sql import upsert
 from app.modules.mental.models import MentalWellness, TherapySession
+from app.modules.mental.search import search_journal
+from app.modules.mental.stressors import compute_stressor_analytics
+from app.modules.mental.therapy import upcoming_follow_ups
+from app.modules.fitness.analytics import parse_range
 from app.modules.mental.forms import (
     MentalWellnessForm, TherapySessionForm, MoodJournalForm,
     MentalWellnessFilterForm
@@ -19,6 +29,7 @@ def index():
     """Mental wellness tracking overview."""
     # Get recent mental wellness entries
     recent_entries = MentalWellness.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(MentalWellness, 'overview'))\
         .order_by(MentalWellness.date.desc())\
         .limit(7).all()
     
@@ -27,10 +38,15 @@ def index():
         .order_by(TherapySession.date.desc())\
         .limit(3).all()
     
-    # Calculate mood average for the past week
-    mood_avg = 0
-    if recent_entries:
-        mood_avg = sum(entry.mood_rating for entry in recent_entries) / len(recent_entries)
+    # Calculate mood average over the last 7 tracked days from the daily rollup
+    recent_days = db.select(UserDailySummary.mood_rating)\
+        .where(UserDailySummary.user_id == current_user.id,
+               UserDailySummary.mental_entries > 0)\
+        .order_by(UserDailySummary.date.desc())\
+        .limit(7).subquery()
+    mood_avg = db.session.execute(
+        db.select(db.func.avg(recent_days.c.mood_rating))
+    ).scalar() or 0
     
     return render_template('mental/index.html',
                            title=_('Mental Wellness'),
@@ -45,57 +61,36 @@ def track():
     form = MentalWellnessForm()
     
     if form.validate_on_submit():
-        # Check if an entry for today already exists
+        # Insert today's entry or update the existing one
         today = datetime.utcnow().date()
-        existing_entry = MentalWellness.query.filter_by(
+        inserted = upsert(MentalWellness, dict(
             user_id=current_user.id,
-            date=today
-        ).first()
+            date=today,
+            mood_rating=form.mood_rating.data,
+            anxiety_level=form.anxiety_level.data,
+            depression_level=form.depression_level.data,
+            focus_clarity=form.focus_clarity.data,
+            motivation=form.motivation.data,
+            social_connection=form.social_connection.data,
+            meditation_minutes=form.meditation_minutes.data,
+            gratitude_practice=form.gratitude_practice.data,
+            therapy_session=form.therapy_session.data,
+            work_stress=form.work_stress.data,
+            financial_stress=form.financial_stress.data,
+            relationship_stress=form.relationship_stress.data,
+            health_stress=form.health_stress.data,
+            triggers=form.triggers.data,
+            coping_strategies=form.coping_strategies.data,
+            journal_entry=form.journal_entry.data,
+            language=current_user.language_preference or 'en'
+        ), index_elements=['user_id', 'date'])
         
-        if existing_entry:
-            # Update existing entry
-            existing_entry.mood_rating = form.mood_rating.data
-            existing_entry.anxiety_level = form.anxiety_level.data
-            existing_entry.depression_level = form.depression_level.data
-            existing_entry.focus_clarity = form.focus_clarity.data
-            existing_entry.motivation = form.motivation.data
-            existing_entry.social_connection = form.social_connection.data
-            existing_entry.meditation_minutes = form.meditation_minutes.data
-            existing_entry.gratitude_practice = form.gratitude_practice.data
-            existing_entry.therapy_session = form.therapy_session.data
-            existing_entry.work_stress = form.work_stress.data
-            existing_entry.financial_stress = form.financial_stress.data
-            existing_entry.relationship_stress = form.relationship_stress.data
-            existing_entry.health_stress = form.health_stress.data
-            existing_entry.triggers = form.triggers.data
-            existing_entry.coping_strategies = form.coping_strategies.data
-            existing_entry.journal_entry = form.journal_entry.data
-            
-            flash(_('Mental wellness entry updated for today.'), 'success')
-        else:
-            # Create new entry
-            entry = MentalWellness(
-                user_id=current_user.id,
-                mood_rating=form.mood_rating.data,
-                anxiety_level=form.anxiety_level.data,
-                depression_level=form.depression_level.data,
-                focus_clarity=form.focus_clarity.data,
-                motivation=form.motivation.data,
-                social_connection=form.social_connection.data,
-                meditation_minutes=form.meditation_minutes.data,
-                gratitude_practice=form.gratitude_practice.data,
-                therapy_session=form.therapy_session.data,
-                work_stress=form.work_stress.data,
-                financial_stress=form.financial_stress.data,
-                relationship_stress=form.relationship_stress.data,
-                health_stress=form.health_stress.data,
-                triggers=form.triggers.data,
-                coping_strategies=form.coping_strategies.data,
-                journal_entry=form.journal_entry.data
-            )
-            db.session.add(entry)
+        if inserted:
             flash(_('Mental wellness entry recorded.'), 'success')
+        else:
+            flash(_('Mental wellness entry updated for today.'), 'success')
         
+        refresh_daily_summary(current_user.id, today)
         db.session.commit()
         return redirect(url_for('mental.index'))
     
@@ -110,19 +105,24 @@ def history():
     filter_form = MentalWellnessFilterForm()
     
     # Apply filters if provided
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 0, type=int) == 1
     start_date = request.args.get('start_date', None)
     end_date = request.args.get('end_date', None)
     
-    query = MentalWellness.query.filter_by(user_id=current_user.id)
+    query = MentalWellness.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(MentalWellness, 'history'))
     
     if start_date:
         query = query.filter(MentalWellness.date >= start_date)
     if end_date:
         query = query.filter(MentalWellness.date <= end_date)
     
-    entries = query.order_by(MentalWellness.date.desc())\
-        .paginate(page=page, per_page=10, error_out=False)
+    try:
+        entries = keyset_paginate(query, (MentalWellness.date, MentalWellness.id),
+                                  cursor=cursor, per_page=10, with_total=with_total)
+    except InvalidCursor:
+        return redirect(url_for('mental.history'))
     
     return render_template('mental/history.html',
                            title=_('Mental Wellness History'),
@@ -136,31 +136,27 @@ def journal():
     form = MoodJournalForm()
     
     if form.validate_on_submit():
-        # Check if an entry for today already exists
+        # Attach the journal to today's entry, creating it if needed
         today = datetime.utcnow().date()
-        existing_entry = MentalWellness.query.filter_by(
+        inserted = upsert(MentalWellness, dict(
             user_id=current_user.id,
-            date=today
-        ).first()
+            date=today,
+            journal_entry=form.journal_entry.data,
+            language=current_user.language_preference or 'en'
+        ), index_elements=['user_id', 'date'], update_columns=['journal_entry', 'language'])
         
-        if existing_entry:
-            # Update existing entry with journal
-            existing_entry.journal_entry = form.journal_entry.data
-            flash(_('Journal entry updated for today.'), 'success')
-        else:
-            # Create new entry with just the journal
-            entry = MentalWellness(
-                user_id=current_user.id,
-                journal_entry=form.journal_entry.data
-            )
-            db.session.add(entry)
+        if inserted:
             flash(_('Journal entry recorded.'), 'success')
+        else:
+            flash(_('Journal entry updated for today.'), 'success')
         
+        refresh_daily_summary(current_user.id, today)
         db.session.commit()
         return redirect(url_for('mental.journal'))
     
     # Get recent journal entries
     recent_journals = MentalWellness.query.filter_by(user_id=current_user.id)\
+        .options(*load_profile(MentalWellness, 'journal'))\
         .filter(MentalWellness.journal_entry.isnot(None))\
         .order_by(MentalWellness.date.desc())\
         .limit(10).all()
@@ -170,6 +166,73 @@ def journal():
                            form=form,
                            recent_journals=recent_journals)
 
+@mental_bp.route('/journal/search')
+@login_required
+def journal_search():
+    """Full-text search over journal entries, triggers and coping strategies."""
+    query = request.args.get('q', '').strip()
+    cursor = request.args.get('cursor', None)
+    
+    results = None
+    if query:
+        try:
+            results = search_journal(current_user.id, query, cursor=cursor)
+        except InvalidCursor:
+            return redirect(url_for('mental.journal_search', q=query))
+    
+    return render_template('mental/journal_search.html',
+                           title=_('Search Journal'),
+                           query=query,
+                           results=results)
+
+@mental_bp.route('/api/journal/search')
+@login_required
+def api_journal_search():
+    """Journal search results as JSON."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify(error=_('Missing search query.')), 400
+    
+    try:
+        results = search_journal(current_user.id, query,
+                                 cursor=request.args.get('cursor', None))
+    except InvalidCursor:
+        return jsonify(error=_('Invalid cursor.')), 400
+    
+    return jsonify(
+        results=[dict(id=hit.id, date=hit.date.isoformat(), rank=hit.rank,
+                      snippet=str(hit.snippet)) for hit in results.items],
+        next_cursor=results.next_cursor,
+        prev_cursor=results.prev_cursor
+    )
+
+@mental_bp.route('/stressors')
+@login_required
+def stressors():
+    """How often each stressor occurs, alone or together, and how mood follows."""
+    try:
+        start_date, end_date, _granularity = parse_range(request.args, default_days=365)
+    except ValueError:
+        flash(_('Invalid date range.'), 'danger')
+        return redirect(url_for('mental.stressors'))
+    
+    result = compute_stressor_analytics(current_user.id, start_date, end_date)
+    
+    return render_template('mental/stressors.html',
+                           title=_('Stressor Analytics'),
+                           analytics=result)
+
+@mental_bp.route('/api/stressors')
+@login_required
+def api_stressors():
+    """Stressor analytics as JSON, for arbitrary date ranges."""
+    try:
+        start_date, end_date, _granularity = parse_range(request.args, default_days=365)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    
+    return jsonify(compute_stressor_analytics(current_user.id, start_date, end_date).to_dict())
+
 @mental_bp.route('/therapy', methods=['GET', 'POST'])
 @login_required
 def therapy():
@@ -190,13 +253,29 @@ def therapy():
         flash(_('Therapy session recorded.'), 'success')
         return redirect(url_for('mental.therapy'))
     
-    # Get all therapy sessions
-    sessions = TherapySession.query.filter_by(user_id=current_user.id)\
-        .order_by(TherapySession.date.desc()).all()
+    cursor = request.args.get('cursor', None)
+    
+    query = TherapySession.query.filter_by(user_id=current_user.id)
+    try:
+        sessions = keyset_paginate(query, (TherapySession.date, TherapySession.id),
+                                   cursor=cursor, per_page=10)
+    except InvalidCursor:
+        return redirect(url_for('mental.therapy'))
     
     return render_template('mental/therapy.html',
                            title=_('Therapy Sessions'),
                            form=form,
+                           sessions=sessions,
+                           follow_ups=upcoming_follow_ups(current_user.id, datetime.utcnow().date()))
+
+@mental_bp.route('/therapy/follow_ups')
+@login_required
+def follow_ups():
+    """Upcoming therapy follow-ups."""
+    sessions = upcoming_follow_ups(current_user.id, datetime.utcnow().date(), limit=50)
+    
+    return render_template('mental/follow_ups.html',
+                           title=_('Upcoming Follow-ups'),
                            sessions=sessions)
 
 @mental_bp.route('/delete_entry/<int:id>', methods=['POST'])
@@ -211,6 +290,7 @@ def delete_entry(id):
         return redirect(url_for('mental.history'))
     
     db.session.delete(entry)
+    refresh_daily_summary(current_user.id, entry.date)
     db.session.commit()
     flash(_('Mental wellness entry deleted.'), 'success')
     return redirect(url_for('mental.history'))
@@ -219,7 +299,7 @@ def delete_entry(id):
 @login_required
 def edit_entry(id):
     """Edit a mental wellness entry."""
-    entry = MentalWellness.query.get_or_404(id)
+    entry = MentalWellness.query.options(*load_profile(MentalWellness, 'detail')).get_or_404(id)
     
     # Check that user owns this entry
     if entry.user_id != current_user.id:
@@ -245,7 +325,9 @@ def edit_entry(id):
         entry.triggers = form.triggers.data
         entry.coping_strategies = form.coping_strategies.data
         entry.journal_entry = form.journal_entry.data
+        entry.language = current_user.language_preference or 'en'
         
+        refresh_daily_summary(current_user.id, entry.date)
         db.session.commit()
         flash(_('Mental wellness entry updated.'), 'success')
         return redirect(url_for('mental.history'))
@@ -271,4 +353,26 @@ def edit_entry(id):
     
     return render_template('mental/edit_entry.html',
                            title=_('Edit Mental Wellness Entry'),
-                           form=form)
\ No newline at end of file
+                           form=form)
+
+@mental_bp.route('/export')
+@login_required
+def export():
+    """Download the mental wellness history as CSV or NDJSON, optionally gzipped."""
+    start_date = request.args.get('start_date', None)
+    end_date = request.args.get('end_date', None)
+    
+    stmt = db.select(*export_columns(MentalWellness))\
+        .where(MentalWellness.user_id == current_user.id)\
+        .order_by(MentalWellness.date, MentalWellness.id)
+    
+    if start_date:
+        stmt = stmt.where(MentalWellness.date >= start_date)
+    if end_date:
+        stmt = stmt.where(MentalWellness.date <= end_date)
+    
+    try:
+        return export_response(stmt, 'mental_wellness_history', request.args.get('format', 'csv'),
+                               compress=request.args.get('gzip', 0, type=int) == 1)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
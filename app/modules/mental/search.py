@@ -0,0 +1,102 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+
+from flask import current_app
+from markupsafe import Markup, escape
+
+from app import db
+from app.modules.mental.models import MentalWellness, regconfig_case
+from app.utils.pagination import keyset_paginate
+
+# Sentinels wrapped around matches by the database; swapped for <mark> tags
+# only after the snippet text has been HTML-escaped.
+_START, _STOP = '\ue000', '\ue001'
+
+_SNIPPET_OPTIONS = (f'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, '
+                    'MinWords=5, MaxWords=20, FragmentDelimiter=" … "')
+
+
+@dataclass(frozen=True)
+class JournalHit:
+    """One ranked journal search result."""
+    id: int
+    date: date
+    rank: float
+    snippet: Markup
+
+
+def _regconfig(configs):
+    """SQL CASE mapping mental_wellness.language to a text search config."""
+    return regconfig_case(configs, current_app.config['BABEL_DEFAULT_LOCALE'])
+
+
+def search_journal(user_id, text, cursor=None, per_page=10):
+    """Search a user's journal, triggers and coping strategies.
+
+    Returns a `KeysetPage` of `JournalHit` ordered by relevance, paginated on
+    (rank, id). Raises `InvalidCursor` for a malformed cursor.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = _postgresql_query(user_id, text)
+    else:
+        query = _fallback_query(user_id, text)
+
+    hits = query.subquery('hits')
+    page = keyset_paginate(db.session.query(hits), (hits.c.rank, hits.c.id),
+                           cursor=cursor, per_page=per_page)
+    page.items = [JournalHit(row.id, row.date, row.rank, highlight(row.snippet))
+                  for row in page.items]
+    return page
+
+
+def _postgresql_query(user_id, text):
+    func = db.func
+    search_vector = MentalWellness.search_vector
+    configs = current_app.config['FTS_CONFIGS']
+
+    # Match the words in every configured language so entries written in
+    # either one are found; the constant tsquery lets the GIN index apply.
+    tsquery = None
+    for name in configs.values():
+        query = func.websearch_to_tsquery(db.literal_column(f"'{name}'::regconfig"), text)
+        tsquery = query if tsquery is None else tsquery.op('||')(query)
+
+    document = func.concat_ws(' … ', MentalWellness.journal_entry,
+                              MentalWellness.triggers, MentalWellness.coping_strategies)
+    return db.select(
+        MentalWellness.id,
+        MentalWellness.date,
+        func.ts_rank_cd(search_vector, tsquery, type_=db.Float).label('rank'),
+        func.ts_headline(db.literal_column(_regconfig(configs)), document, tsquery,
+                         _SNIPPET_OPTIONS).label('snippet')
+    ).where(
+        MentalWellness.user_id == user_id,
+        search_vector.op('@@')(tsquery)
+    )
+
+
+def _fallback_query(user_id, text):
+    # Databases without text search (SQLite in development): every word must
+    # appear in one of the notes; results are not ranked
+    words = re.findall(r'\w+', text.lower())
+    notes = (MentalWellness.journal_entry, MentalWellness.triggers,
+             MentalWellness.coping_strategies)
+    matches = [db.or_(*[db.func.lower(column).contains(word, autoescape=True)
+                        for column in notes])
+               for word in words]
+    return db.select(
+        MentalWellness.id,
+        MentalWellness.date,
+        db.literal(0.0, db.Float).label('rank'),
+        db.func.substr(MentalWellness.journal_entry, 1, 200).label('snippet')
+    ).where(
+        MentalWellness.user_id == user_id,
+        db.and_(*matches) if matches else db.false()
+    )
+
+
+def highlight(snippet):
+    """Escape a database snippet and turn its match sentinels into <mark> tags."""
+    html = str(escape(snippet or ''))
+    return Markup(html.replace(_START, '<mark>').replace(_STOP, '</mark>'))
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app import db
+from app.modules.mental.models import MentalWellness
+
+# Stressor flags in bit order of MentalWellness.stressor_mask
+STRESSORS = ('work_stress', 'financial_stress', 'relationship_stress', 'health_stress')
+
+
+@dataclass(frozen=True)
+class StressorStats:
+    """How often a stressor was reported and how mood and anxiety differed."""
+    name: str
+    days: int
+    share: float
+    mood_avg: Optional[float]
+    anxiety_avg: Optional[float]
+    mood_avg_without: Optional[float]
+    anxiety_avg_without: Optional[float]
+
+
+@dataclass(frozen=True)
+class Combination:
+    """Days on which exactly this set of stressors was reported."""
+    stressors: Tuple[str, ...]
+    days: int
+    mood_avg: Optional[float]
+    anxiety_avg: Optional[float]
+
+
+@dataclass(frozen=True)
+class StressorAnalytics:
+    """Result of `compute_stressor_analytics` for one user and date range.
+
+    ``co_occurrence[i, j]`` is the number of days on which stressors i and
+    j were both reported; its diagonal holds each stressor's frequency.
+    """
+    start_date: date
+    end_date: date
+    entries: int
+    stressors: List[StressorStats]
+    co_occurrence: np.ndarray
+    combinations: List[Combination]
+
+    def to_dict(self):
+        return {
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'entries': self.entries,
+            'stressors': [stats.__dict__ for stats in self.stressors],
+            'co_occurrence': {name: dict(zip(STRESSORS, map(int, row)))
+                              for name, row in zip(STRESSORS, self.co_occurrence)},
+            'combinations': [dict(combination.__dict__, stressors=list(combination.stressors))
+                             for combination in self.combinations]
+        }
+
+
+def compute_stressor_analytics(user_id, start_date, end_date):
+    """Stressor frequency, co-occurrence and mood impact over a date range.
+
+    One aggregate query groups the range by the stored stressor bitmask,
+    which yields at most 16 rows however long the range is; frequencies,
+    co-occurrences and averages with and without each stressor are then
+    derived from those groups with NumPy.
+    """
+    func = db.func
+    rows = db.session.execute(
+        db.select(
+            MentalWellness.stressor_mask,
+            func.count(MentalWellness.id),
+            func.coalesce(func.sum(MentalWellness.mood_rating), 0),
+            func.count(MentalWellness.mood_rating),
+            func.coalesce(func.sum(MentalWellness.anxiety_level), 0),
+            func.count(MentalWellness.anxiety_level)
+        )
+        .where(MentalWellness.user_id == user_id,
+               MentalWellness.date.between(start_date, end_date))
+        .group_by(MentalWellness.stressor_mask)
+        .order_by(MentalWellness.stressor_mask)
+    ).all()
+
+    groups = np.array(rows, dtype=np.int64).reshape(-1, 6)
+    masks, days, mood_sum, mood_count, anxiety_sum, anxiety_count = groups.T
+    # (groups, stressors) matrix: 1 where the group's mask has the stressor
+    present = (masks[:, None] >> np.arange(len(STRESSORS))) & 1
+    absent = 1 - present
+    entries = int(days.sum())
+
+    def average(totals, counts):
+        return [float(total) / int(count) if count else None
+                for total, count in zip(totals, counts)]
+
+    frequency = present.T @ days
+    mood_with = average(present.T @ mood_sum, present.T @ mood_count)
+    anxiety_with = average(present.T @ anxiety_sum, present.T @ anxiety_count)
+    mood_without = average(absent.T @ mood_sum, absent.T @ mood_count)
+    anxiety_without = average(absent.T @ anxiety_sum, absent.T @ anxiety_count)
+
+    stressors = [
+        StressorStats(name, int(frequency[index]),
+                      float(frequency[index]) / entries if entries else 0.0,
+                      mood_with[index], anxiety_with[index],
+                      mood_without[index], anxiety_without[index])
+        for index, name in enumerate(STRESSORS)
+    ]
+    mood = average(mood_sum, mood_count)
+    anxiety = average(anxiety_sum, anxiety_count)
+    combinations = sorted(
+        (Combination(tuple(name for name, bit in zip(STRESSORS, bits) if bit),
+                     int(count), mood[index], anxiety[index])
+         for index, (bits, count) in enumerate(zip(present, days))),
+        key=lambda combination: combination.days, reverse=True
+    )
+
+    return StressorAnalytics(
+        start_date=start_date,
+        end_date=end_date,
+        entries=entries,
+        stressors=stressors,
+        co_occurrence=(present * days[:, None]).T @ present,
+        combinations=combinations
+    )
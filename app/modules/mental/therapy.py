@@ -0,0 +1,40 @@
+from datetime import datetime, time, timedelta
+
+from app import db
+from app.modules.mental.models import TherapySession
+
+# follow_up_date is entered as a date and stored at midnight, so follow-ups
+# are selected by whole days
+
+
+def _start_of(day):
+    return datetime.combine(day, time.min)
+
+
+def upcoming_follow_ups(user_id, today, limit=5):
+    """The user's follow-ups from `today` on, soonest first.
+
+    Reads the (user_id, follow_up_date) index in order and stops after
+    `limit` rows.
+    """
+    return TherapySession.query\
+        .filter(TherapySession.user_id == user_id,
+                TherapySession.follow_up_date >= _start_of(today))\
+        .order_by(TherapySession.follow_up_date)\
+        .limit(limit).all()
+
+
+def due_follow_ups(first_day, last_day):
+    """Follow-ups of all users scheduled from `first_day` to `last_day` included, soonest first.
+
+    One range scan of the partial follow_up_date index, so the cost
+    depends on the number of follow-ups due, not on the number of users
+    or sessions.
+    """
+    return db.session.execute(
+        db.select(TherapySession.id, TherapySession.user_id, TherapySession.follow_up_date,
+                  TherapySession.therapist)
+        .where(TherapySession.follow_up_date >= _start_of(first_day),
+               TherapySession.follow_up_date < _start_of(last_day + timedelta(days=1)))
+        .order_by(TherapySession.follow_up_date)
+    ).all()
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+
+from app import db
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8'
+}
+
+# Rows fetched from the server-side cursor, encoded and sent per chunk
+BATCH_SIZE = 1000
+
+# Columns that only make sense inside this database
+_INTERNAL_COLUMNS = ('id', 'user_id')
+
+
+def export_columns(model, exclude=()):
+    """Columns of `model` worth exporting, in table order; generated columns are left out."""
+    return [column for column in model.__table__.columns
+            if column.name not in _INTERNAL_COLUMNS and column.name not in exclude
+            and column.computed is None]
+
+
+def export_response(stmt, filename, file_format='csv', compress=False):
+    """Stream the rows of a SELECT as a CSV or NDJSON file download.
+
+    Rows are read from a server-side cursor BATCH_SIZE at a time
+    (``yield_per``) and each batch is encoded, optionally gzipped, and sent
+    before the next one is fetched, so memory stays flat however many rows
+    the statement returns. Raises ValueError for an unknown format.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unsupported export format: {file_format}')
+
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    names = list(result.keys())
+    encode = _csv_batches if file_format == 'csv' else _ndjson_batches
+    chunks = encode(names, result.partitions())
+    filename = f'{filename}.{file_format}'
+    mimetype = FORMATS[file_format]
+    if compress:
+        chunks = _gzip(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_batches(names, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in partitions:
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_batches(names, partitions):
+    for rows in partitions:
+        yield ''.join(
+            json.dumps({name: _value(value) for name, value in zip(names, row)}) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,14 @@
+from app import db
+
+
+def load_profile(model, view):
+    """Loader options for one of the views declared in `model.LOAD_PROFILES`.
+
+    A profile is either a tuple of column names, loaded with ``load_only``
+    so the SELECT only projects those columns, or ``'full'``, which also
+    loads the deferred text columns in the same query.
+    """
+    columns = model.LOAD_PROFILES[view]
+    if columns == 'full':
+        return [db.undefer_group('text')]
+    return [db.load_only(*[getattr(model, name) for name in columns])]
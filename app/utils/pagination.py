@@ -0,0 +1,141 @@
+import base64
+import json
+from datetime import date, datetime
+
+from app import db
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(direction, values):
+    """Encode a direction ('next' or 'prev') and sort-key values as an opaque token."""
+    payload = [direction] + [value.isoformat() if isinstance(value, date) else value
+                             for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token built by `encode_cursor` into ``(direction, values)``."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        direction, values = payload[0], payload[1:]
+    except (ValueError, TypeError, IndexError) as e:
+        raise InvalidCursor(token) from e
+    if direction not in ('next', 'prev'):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+class KeysetPage:
+    """One page of keyset-paginated results.
+
+    `items` holds the rows in display order (newest first). `next_cursor`
+    and `prev_cursor` are opaque tokens for the adjacent pages, or None at
+    either end. `total` is an approximate row count when requested.
+    """
+
+    def __init__(self, items, next_cursor, prev_cursor, per_page, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=10, with_total=False, key=None):
+    """Paginate `query` in descending order of `columns` without OFFSET.
+
+    `columns` must form a unique sort key, typically ``(Model.date, Model.id)``.
+    Each page seeks past the last key of the previous one with a row-value
+    comparison, which the (user_id, date) indexes answer directly no matter
+    how deep the page is, and no COUNT(*) is issued. `key` extracts the sort
+    values from a result item and defaults to reading the column attributes.
+    """
+    key = key or (lambda item: [getattr(item, column.key) for column in columns])
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    if values is not None and len(values) != len(columns):
+        raise InvalidCursor(cursor)
+
+    total = estimate_count(query) if with_total else None
+
+    page_query = query
+    if values is not None:
+        try:
+            values = [_coerce(column, value) for column, value in zip(columns, values)]
+        except (TypeError, ValueError) as e:
+            raise InvalidCursor(cursor) from e
+        keys, bound = db.tuple_(*columns), db.tuple_(*values)
+        page_query = page_query.filter(keys < bound if direction == 'next' else keys > bound)
+
+    if direction == 'next':
+        page_query = page_query.order_by(*[column.desc() for column in columns])
+    else:
+        page_query = page_query.order_by(*[column.asc() for column in columns])
+
+    # Fetch one extra row to learn whether another page follows
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == 'next':
+            more_after, more_before = has_more, values is not None
+        else:
+            more_after, more_before = True, has_more
+        if more_after:
+            next_cursor = encode_cursor('next', key(rows[-1]))
+        if more_before:
+            prev_cursor = encode_cursor('prev', key(rows[0]))
+
+    return KeysetPage(rows, next_cursor, prev_cursor, per_page, total)
+
+
+def estimate_count(query):
+    """Approximate number of rows `query` returns, without running it.
+
+    Uses the planner's row estimate from EXPLAIN on PostgreSQL. Other
+    databases fall back to an exact COUNT(*).
+    """
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return query.order_by(None).count()
+
+    compiled = query.order_by(None).statement.compile(dialect=bind.dialect)
+    plan = db.session.connection().exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {compiled.string}', compiled.params
+    ).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _coerce(column, value):
+    # Cursor values travel as JSON; restore the column's type, so that a
+    # tampered value fails here (TypeError or ValueError) rather than in
+    # the database
+    if isinstance(value, (list, dict, bool)):
+        raise TypeError(f'Unexpected cursor value {value!r}')
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type in (int, float):
+        return python_type(value)
+    return value
@@ -0,0 +1,50 @@
+from app import db
+
+
+def dialect_insert(model):
+    """Return the dialect-specific INSERT for `model`, which supports ON CONFLICT."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upserts are not supported on {dialect}')
+    return insert(model)
+
+
+def upsert(model, values, index_elements, update_columns=None, index_where=None):
+    """Insert a row or update the row that conflicts on `index_elements`.
+
+    Runs a single ``INSERT ... ON CONFLICT DO UPDATE`` statement, so there is
+    no SELECT round trip and concurrent submits cannot create duplicates.
+    `update_columns` defaults to every value outside the conflict key, and
+    `index_where` targets a partial unique index. Returns True when a new
+    row was inserted and False when an existing row was updated.
+
+    PostgreSQL reports which happened through the system column xmax, which
+    is 0 on a freshly inserted row version. Other databases have no such
+    marker: the conflicting row is looked up first, which a concurrent
+    writer can race (acceptable for the development SQLite database).
+    """
+    if update_columns is None:
+        update_columns = [name for name in values
+                          if name not in index_elements and name != 'created_at']
+
+    stmt = dialect_insert(model).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        index_where=index_where,
+        set_={name: stmt.excluded[name] for name in update_columns}
+    )
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        stmt = stmt.returning(db.literal_column('xmax') == 0)
+        return db.session.execute(stmt).scalar_one()
+
+    conditions = [getattr(model, name) == values[name] for name in index_elements]
+    if index_where is not None:
+        conditions.append(index_where)
+    existed = db.session.execute(db.select(db.literal(1)).where(*conditions)).first()
+    db.session.execute(stmt)
+    return existed is None
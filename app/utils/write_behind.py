@@ -0,0 +1,119 @@
+import atexit
+import os
+import threading
+
+from app import db
+
+
+class WriteBehind:
+    """Buffers low-value column updates and writes them in batches.
+
+    `set` records new values for a row of `model` in memory; values for the
+    same row are coalesced, so a user signing in ten times between flushes
+    costs one UPDATE. A background thread of the worker process writes the
+    buffer every `interval` seconds, as one executemany UPDATE per set of
+    columns, on its own connection. The buffer is also flushed when it
+    reaches `max_pending` rows and at interpreter exit.
+
+    Buffered values are lost if the process is killed before a flush or
+    the flush fails, so only use this for data that can afford it
+    (timestamps, preferences). Readers should overlay `pending` values on
+    what they load. With an interval of 0 every `set` is written at once.
+    """
+
+    def __init__(self, model, columns, interval=5.0, max_pending=1000, on_flush=None):
+        self.model = model
+        self.columns = tuple(columns)
+        self.interval = interval
+        self.max_pending = max_pending
+        self.on_flush = on_flush
+        self.app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['WRITE_BEHIND_INTERVAL']
+        self.max_pending = app.config['WRITE_BEHIND_MAX_PENDING']
+        atexit.register(self.flush)
+
+    def set(self, key, **values):
+        """Buffer new column values for the row with primary key `key`."""
+        unknown = set(values) - set(self.columns)
+        if unknown:
+            raise ValueError(f'Not write-behind columns: {", ".join(sorted(unknown))}')
+        with self._lock:
+            self._pending.setdefault(key, {}).update(values)
+            full = len(self._pending) >= self.max_pending
+        if self.interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, key):
+        """Values buffered for `key` and not yet written, as a dict."""
+        with self._lock:
+            return dict(self._pending.get(key, ()))
+
+    def discard(self, key, *columns):
+        """Drop buffered values that a direct write has superseded."""
+        with self._lock:
+            values = self._pending.get(key)
+            if values is None:
+                return
+            for column in columns:
+                values.pop(column, None)
+            if not values:
+                del self._pending[key]
+
+    def flush(self):
+        """Write every buffered value now. Returns the number of rows updated."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        # One executemany per combination of columns
+        groups = {}
+        for key, values in batch.items():
+            groups.setdefault(tuple(sorted(values)), []).append(dict(values, _key=key))
+        table = self.model.__table__
+        primary_key = table.primary_key.columns[0]
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                for columns, rows in groups.items():
+                    connection.execute(
+                        db.update(table).where(primary_key == db.bindparam('_key'))
+                        .values({column: db.bindparam(column) for column in columns}),
+                        rows
+                    )
+        except Exception:
+            # Dropped rather than retried, so one bad value cannot block
+            # every later flush
+            self.app.logger.exception('Write-behind flush of %d %s rows failed',
+                                      len(batch), table.name)
+            return 0
+
+        if self.on_flush is not None:
+            self.on_flush(list(batch))
+        return len(batch)
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork (e.g. gunicorn --preload): start one
+        # in each process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='write-behind', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
@@ -0,0 +1,64 @@
+"""History export: streamed rows per second and peak memory by history size.
+
+The peak Python memory of an export should stay flat as the number of rows
+grows, since rows are fetched and encoded one batch at a time.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from app import db
+from app.modules.health.models import HealthSurvey
+from app.utils.export import export_columns, export_response
+from benchmarks.common import bench_app, create_user
+
+
+def seed_surveys(user_id, rows):
+    start = date.today() - timedelta(days=rows)
+    batch = []
+    for i in range(rows):
+        batch.append(dict(user_id=user_id, date=start + timedelta(days=i), weight=70 + i % 5,
+                          heart_rate=60 + i % 20, sleep_duration=7.5, notes='Slept well.'))
+        if len(batch) == 5000:
+            db.session.execute(db.insert(HealthSurvey), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(HealthSurvey), batch)
+    db.session.commit()
+
+
+def run_export(app, user_id, file_format, compress):
+    stmt = db.select(*export_columns(HealthSurvey))\
+        .where(HealthSurvey.user_id == user_id)\
+        .order_by(HealthSurvey.date, HealthSurvey.id)
+    with app.test_request_context():
+        response = export_response(stmt, 'health_history', file_format, compress)
+        return sum(len(chunk) for chunk in response.response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        for index, size in enumerate(args.sizes):
+            user_id = create_user(f'bench{index}').id
+            seed_surveys(user_id, size)
+            for file_format, compress in (('csv', False), ('ndjson', False), ('csv', True)):
+                db.session.remove()
+                tracemalloc.start()
+                start = time.perf_counter()
+                written = run_export(app, user_id, file_format, compress)
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                label = f"{size} rows {file_format}{' gzip' if compress else ''}"
+                print(f'{label:<30} {size / seconds:10.0f} rows/s   '
+                      f'{written / 1e6:7.2f} MB out   peak {peak / 1e6:6.2f} MB')
+
+
+if __name__ == '__main__':
+    main()
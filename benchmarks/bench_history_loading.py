@@ -0,0 +1,69 @@
+"""History page loading: full rows vs the per-view column projections.
+
+Seeds one user with a long mental wellness history whose journal, trigger
+and coping-strategy texts are several kilobytes each. It then measures the
+latency and the peak Python memory of loading history pages with every
+column and with the 'history' load profile, where the text columns stay
+deferred.
+"""
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+
+from app import db
+from app.modules.mental.models import MentalWellness
+from app.utils.loading import load_profile
+from app.utils.pagination import keyset_paginate
+from benchmarks.common import bench_app, create_user, measure, report
+
+
+def seed_history(user_id, days, journal_bytes):
+    text = ('Today I wrote a long reflection about my week. ' * (journal_bytes // 48 + 1))[:journal_bytes]
+    start = date.today() - timedelta(days=days)
+    rows = [dict(user_id=user_id, date=start + timedelta(days=i), mood_rating=i % 10 + 1,
+                 anxiety_level=(i * 3) % 10 + 1, triggers=text[:journal_bytes // 4],
+                 coping_strategies=text[:journal_bytes // 4], journal_entry=text)
+            for i in range(days)]
+    for offset in range(0, len(rows), 1000):
+        db.session.execute(db.insert(MentalWellness), rows[offset:offset + 1000])
+    db.session.commit()
+
+
+def load_page(user_id, view, per_page):
+    query = MentalWellness.query.filter_by(user_id=user_id)\
+        .options(*load_profile(MentalWellness, view))
+    return keyset_paginate(query, (MentalWellness.date, MentalWellness.id), per_page=per_page)
+
+
+def peak_memory_kb(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.remove()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--journal-bytes', type=int, default=4096)
+    parser.add_argument('--per-page', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        user_id = create_user().id
+        seed_history(user_id, args.days, args.journal_bytes)
+
+        for per_page in args.per_page:
+            print(f'--- {per_page} rows per page, {args.journal_bytes} byte journals')
+            for view in ('detail', 'history'):
+                label = f"{view} profile"
+                report(label, measure(lambda: load_page(user_id, view, per_page), args.repeat))
+                print(f'{"":<40} peak memory {peak_memory_kb(lambda: load_page(user_id, view, per_page)):8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Login throughput: successful sign-ins per second under concurrent clients.
+
+Each client thread posts the login form in a loop for a fixed duration.
+Sign-ins refused because the password hashing pool is saturated (HTTP 503)
+are counted separately; with a bounded pool they should appear instead of
+latencies growing without limit.
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app import db
+from app.auth.models import User, password_hasher
+from benchmarks.common import bench_app
+
+
+def client_loop(app, deadline, latencies, refused):
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = client.post('/auth/login', data={'username': 'bench',
+                                                    'password': 'benchmark-password'})
+        if response.status_code == 503:
+            refused.append(1)
+        else:
+            latencies.append(time.perf_counter() - start)
+        client.get('/auth/logout')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--method', default='pbkdf2:sha256:600000',
+                        help='password hash method and cost')
+    parser.add_argument('--workers', type=int, default=2, help='hashing pool threads (0: inline)')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = bench_app()
+    app.config.update(PASSWORD_HASH_METHOD=args.method, PASSWORD_HASH_WORKERS=args.workers)
+    password_hasher.init_app(app)
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com', password='benchmark-password')
+        db.session.add(user)
+        db.session.commit()
+
+    for clients in args.clients:
+        latencies, refused = [], []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client_loop, args=(app, deadline, latencies, refused))
+                   for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else float('nan')
+        print(f'{clients:3d} clients  {len(latencies) / args.duration:8.1f} logins/s   '
+              f'median {statistics.median(latencies) * 1000:7.1f} ms   '
+              f'p95 {p95 * 1000:7.1f} ms   refused {len(refused)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Workout plan rendering: lazy relationships vs the plan repository.
+
+Seeds a plan with one workout per day and a configurable number of
+exercises each, then walks the whole tree through the ORM's dynamic
+relationships (1 + 7 + 7N queries) and through `repository.get_plan`.
+Prints latency and query counts, and exits with an error if the
+repository needs more than MAX_PLAN_QUERIES statements, so the script
+doubles as a query-count regression check.
+"""
+import argparse
+import sys
+
+from app import db
+from app.modules.fitness import repository
+from app.modules.fitness.models import WorkoutPlan, PlannedWorkout, Exercise
+from benchmarks.common import bench_app, create_user, count_queries, measure, report
+
+MAX_PLAN_QUERIES = 1
+
+
+def seed_plan(user_id, exercises_per_day):
+    plan = WorkoutPlan(user_id=user_id, name='Bench plan', description='Seven day split')
+    db.session.add(plan)
+    db.session.flush()
+    for day in range(7):
+        workout = PlannedWorkout(plan_id=plan.id, day_of_week=day, workout_type='strength',
+                                 duration=60, description=f'Day {day}')
+        db.session.add(workout)
+        db.session.flush()
+        db.session.execute(db.insert(Exercise), [
+            dict(workout_id=workout.id, name=f'Exercise {i}', sets=4, reps=10, weight=40.0)
+            for i in range(exercises_per_day)
+        ])
+    db.session.commit()
+
+
+def walk_lazy(user_id):
+    plan = WorkoutPlan.query.filter_by(user_id=user_id).first()
+    return [(workout.workout_type, [exercise.name for exercise in workout.exercises])
+            for workout in plan.workouts]
+
+
+def walk_repository(user_id):
+    plan = repository.get_plan(user_id)
+    return [(workout.workout_type, [exercise.name for exercise in workout.exercises])
+            for workout in plan.workouts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exercises', type=int, default=8, help='exercises per day')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        user_id = create_user().id
+        seed_plan(user_id, args.exercises)
+
+        query_counts = {}
+        for label, walk in (('dynamic relationships', walk_lazy),
+                            ('plan repository', walk_repository)):
+            with count_queries() as statements:
+                tree = walk(user_id)
+            db.session.remove()
+            query_counts[label] = len(statements)
+            assert sum(len(exercises) for _, exercises in tree) == 7 * args.exercises
+            report(f'{label} ({len(statements)} queries)',
+                   measure(lambda: walk(user_id), args.repeat))
+
+        if query_counts['plan repository'] > MAX_PLAN_QUERIES:
+            sys.exit(f"plan repository issued {query_counts['plan repository']} queries, "
+                     f'expected at most {MAX_PLAN_QUERIES}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Training-load engine: full computation vs cached incremental updates.
+
+Seeds one user with years of daily workouts, then measures computing the
+whole series from scratch, serving it from the per-process cache, and
+updating it after a new workout is logged (only the tail is refetched and
+the rolling windows recomputed from the changed day).
+"""
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+from app import db
+from app.core.rollup import refresh_daily_summary, refresh_daily_summary_range
+from app.modules.fitness import training_load
+from app.modules.fitness.models import FitnessMetric
+from benchmarks.common import bench_app, create_user, measure, report
+
+
+def seed_workouts(user_id, days):
+    rng = np.random.default_rng(0)
+    start = date.today() - timedelta(days=days - 1)
+    rows = [dict(user_id=user_id, date=start + timedelta(days=i), entry_type='daily',
+                 workout_duration=int(rng.integers(20, 90)),
+                 workout_intensity=int(rng.integers(1, 11)),
+                 heart_rate_avg=int(rng.integers(100, 170)))
+            for i in range(days)]
+    for offset in range(0, len(rows), 1000):
+        db.session.execute(db.insert(FitnessMetric), rows[offset:offset + 1000])
+    refresh_daily_summary_range(user_id, start, date.today())
+    db.session.commit()
+
+
+def log_workout(user_id):
+    metric = FitnessMetric(user_id=user_id, date=date.today(), entry_type='session',
+                           workout_duration=45, workout_intensity=7, heart_rate_avg=140)
+    db.session.add(metric)
+    refresh_daily_summary(user_id, metric.date)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=5 * 365)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        user_id = create_user().id
+        seed_workouts(user_id, args.days)
+
+        def cold():
+            training_load._cache.clear()
+            training_load.get_training_load(user_id)
+
+        def after_write():
+            log_workout(user_id)
+            training_load.get_training_load(user_id)
+
+        report('full computation', measure(cold, args.repeat))
+        report('cached', measure(lambda: training_load.get_training_load(user_id), args.repeat))
+        report('incremental after a new workout', measure(after_write, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Weekly fitness totals: Python sums over ORM rows vs SQL aggregates.
+
+Seeds one user with a heavy week (many workout sessions per day) and
+compares the former fitness.index implementation, which loaded every row of
+the week, with a SUM/COUNT aggregate over fitness_metrics and with
+`services.weekly_stats`, which aggregates the daily rollup.
+"""
+import argparse
+from datetime import timedelta
+
+from app import db
+from app.core.rollup import refresh_daily_summary_range
+from app.modules.fitness import services
+from app.modules.fitness.models import FitnessMetric
+from benchmarks.common import bench_app, create_user, measure, report
+
+
+def seed_week(user_id, entries_per_day):
+    week_start, week_end = services.week_bounds()
+    rows = []
+    for offset in range(7):
+        for i in range(entries_per_day):
+            rows.append(dict(
+                user_id=user_id, date=week_start + timedelta(days=offset),
+                entry_type='session', steps=1000 + i, distance=1.5,
+                calories_burned=120, workout_type='strength',
+                workout_duration=30, workout_intensity=6,
+                workout_notes='Set notes ' * 20
+            ))
+    db.session.execute(db.insert(FitnessMetric), rows)
+    refresh_daily_summary_range(user_id, week_start, week_end)
+    db.session.commit()
+
+
+def python_sums(user_id):
+    week_start, week_end = services.week_bounds()
+    weekly_workouts = FitnessMetric.query.filter_by(user_id=user_id)\
+        .filter(FitnessMetric.date >= week_start, FitnessMetric.date <= week_end)\
+        .all()
+    return {
+        'total_workouts': len(weekly_workouts),
+        'total_duration': sum(w.workout_duration or 0 for w in weekly_workouts),
+        'total_distance': sum(w.distance or 0 for w in weekly_workouts),
+        'total_calories': sum(w.calories_burned or 0 for w in weekly_workouts),
+        'total_steps': sum(w.steps or 0 for w in weekly_workouts)
+    }
+
+
+def raw_aggregate(user_id):
+    week_start, week_end = services.week_bounds()
+    func = db.func
+    return db.session.execute(db.select(
+        func.count(FitnessMetric.id),
+        func.coalesce(func.sum(FitnessMetric.workout_duration), 0),
+        func.coalesce(func.sum(FitnessMetric.distance), 0),
+        func.coalesce(func.sum(FitnessMetric.calories_burned), 0),
+        func.coalesce(func.sum(FitnessMetric.steps), 0)
+    ).where(
+        FitnessMetric.user_id == user_id,
+        FitnessMetric.date.between(week_start, week_end)
+    )).one()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries-per-day', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        for entries in args.entries_per_day:
+            user = create_user(f'bench{entries}')
+            seed_week(user.id, entries)
+            user_id = user.id
+
+            expected = python_sums(user_id)
+            actual = services.weekly_stats(user_id)
+            assert expected['total_workouts'] == actual['total_workouts']
+            assert expected['total_steps'] == actual['total_steps']
+
+            print(f'--- {entries} entries per day ({entries * 7} rows in the week)')
+            report('ORM rows + Python sum()', measure(lambda: python_sums(user_id), args.repeat))
+            report('SUM/COUNT over fitness_metrics', measure(lambda: raw_aggregate(user_id), args.repeat))
+            report('services.weekly_stats (rollup)', measure(lambda: services.weekly_stats(user_id), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Workout session writes: per-object session.add vs bulk insert.
+
+Logs sessions with many exercises (one row per set, as strength sessions
+are recorded) through the ORM unit of work, one Exercise object at a time,
+and through `services.record_workout_session`, which inserts the metric
+with RETURNING and the exercises with a single executemany INSERT.
+"""
+import argparse
+from datetime import date
+
+from app import db
+from app.core.rollup import refresh_daily_summary
+from app.modules.fitness import services
+from app.modules.fitness.models import FitnessMetric, Exercise
+from benchmarks.common import bench_app, create_user, count_queries, measure, report
+
+
+def make_exercises(count):
+    return [dict(name=f'Exercise {i // 4}', sets=1, reps=8 + i % 4, weight=60.0 + i,
+                 duration=None, notes=None) for i in range(count)]
+
+
+def session_values():
+    return dict(date=date.today(), workout_type='strength', workout_duration=75,
+                workout_intensity=8, workout_notes='Heavy day')
+
+
+def record_per_object(user_id, exercises):
+    metric = FitnessMetric(user_id=user_id, entry_type='session', **session_values())
+    db.session.add(metric)
+    db.session.flush()
+    for exercise in exercises:
+        db.session.add(Exercise(metric_id=metric.id, **exercise))
+    refresh_daily_summary(user_id, metric.date)
+    db.session.commit()
+
+
+def record_bulk(user_id, exercises):
+    services.record_workout_session(user_id, session_values(), exercises)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exercises', type=int, nargs='+', default=[20, 50, 100])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        user_id = create_user().id
+
+        for count in args.exercises:
+            exercises = make_exercises(count)
+            print(f'--- {count} exercises per session')
+            for label, record in (('per-object session.add', record_per_object),
+                                  ('bulk insert', record_bulk)):
+                with count_queries() as statements:
+                    record(user_id, exercises)
+                db.session.remove()
+                report(f'{label} ({len(statements)} statements)',
+                       measure(lambda: record(user_id, exercises), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
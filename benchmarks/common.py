@@ -0,0 +1,83 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks use the database of the configuration named by the BENCH_CONFIG
+environment variable (default: ``testing``). The schema of that database is
+dropped and recreated on start, so never point it at real data.
+
+Run a benchmark from the project root, e.g.::
+
+    python -m benchmarks.bench_weekly_stats
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.auth.models import User
+
+
+def bench_app():
+    """Create the application and reset its database schema."""
+    app = create_app(os.environ.get('BENCH_CONFIG', 'testing'))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def create_user(username='bench'):
+    """Create and return a benchmark user."""
+    user = User(username=username, email=f'{username}@example.com',
+                password='benchmark-password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def measure(func, repeat=50, warmup=3):
+    """Call `func` repeatedly and return the durations in milliseconds.
+
+    The session is cleared after every call so ORM identity-map hits do not
+    hide hydration costs.
+    """
+    for _ in range(warmup):
+        func()
+        db.session.remove()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+        db.session.remove()
+    return samples
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent to the database inside the block.
+
+    Yields a list that receives every statement executed, so its length is
+    the query count once the block exits.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def report(label, samples):
+    """Print the median and 95th percentile of `samples`."""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f'{label:<40} median {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms')
@@ -0,0 +1,119 @@
+"""Load test of the dashboard under gunicorn, one run per worker class.
+
+For each worker class a gunicorn server is started with gunicorn.conf.py
+on the benchmark database, and `--clients` threads, each signed in as the
+benchmark user over a keep-alive connection, request /dashboard (or
+`--path`) for `--duration` seconds. Reports requests per second, latency
+percentiles and errors.
+
+    python -m benchmarks.load_dashboard --worker-classes sync gthread gevent
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import bench_app, create_user
+
+PORT = 8099
+
+
+def wait_ready(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def sign_in(connection):
+    connection.request('POST', '/auth/login',
+                       body=urlencode({'username': 'bench', 'password': 'benchmark-password'}),
+                       headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if response.status != 302 or not cookie:
+        raise RuntimeError(f'Login failed with status {response.status}')
+    return cookie.split(';', 1)[0]
+
+
+def client_loop(path, deadline, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    headers = {'Cookie': sign_in(connection)}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Worker recycled under us (max_requests): reconnect
+            errors.append(1)
+            connection.close()
+            continue
+        if response.status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+
+
+def run(worker_class, args):
+    env = dict(os.environ, FLASK_ENV=os.environ.get('BENCH_CONFIG', 'testing'),
+               GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=str(args.workers),
+               PORT=str(PORT))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+                               '--access-logfile', '/dev/null', 'run:app'], env=env)
+    try:
+        wait_ready()
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client_loop, args=(args.path, deadline, latencies, errors))
+                   for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    if len(latencies) < 2:
+        print(f'{worker_class:<8} no successful requests, errors {len(errors)}')
+        return
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f'{worker_class:<8} {len(latencies) / args.duration:8.1f} req/s   '
+          f'p50 {cuts[49] * 1000:7.1f} ms   p95 {cuts[94] * 1000:7.1f} ms   '
+          f'p99 {cuts[98] * 1000:7.1f} ms   errors {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--worker-classes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--path', default='/dashboard', help='page requested by the clients')
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        create_user('bench')
+
+    for worker_class in args.worker_classes:
+        run(worker_class, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,14 +11,52 @@ class Config:
     
     # Flask-Login
     LOGIN_DISABLED = False
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))  # users per worker, 0 disables
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # in seconds
+    
+    # Password hashing: werkzeug method with its work factor, and the
+    # per-process pool that runs it (see app.auth.hashing)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # 0 hashes inline
+    # Waiting requests hold a request thread each: together with the
+    # hashing ones, leave at least one of the gunicorn worker's threads to
+    # other routes, and send the rest a 503 almost at once
+    PASSWORD_HASH_QUEUE = int(os.environ.get(
+        'PASSWORD_HASH_QUEUE',
+        max(0, int(os.environ.get('GUNICORN_THREADS', 4)) - 1 - PASSWORD_HASH_WORKERS)
+    ))
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 0.1))  # in seconds
+    
+    # Login throttle: (attempts, seconds) token buckets per client address
+    # and per account, kept per worker ('memory') or in a key-value store
+    # ('local' is its in-process stand-in, see app.auth.throttle)
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_THROTTLE_PER_IP = (20, 60)
+    LOGIN_THROTTLE_PER_ACCOUNT = (5, 300)
+    LOGIN_THROTTLE_STORE = os.environ.get('LOGIN_THROTTLE_STORE', 'memory')
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))  # reverse proxies in front
+    
+    # Buffered last_login / language updates (see app.utils.write_behind)
+    WRITE_BEHIND_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', 5.0))  # in seconds, 0 writes at once
+    WRITE_BEHIND_MAX_PENDING = 1000  # users buffered before an early flush
     
     # Flask-Babel
     LANGUAGES = ['en', 'fr']
     BABEL_DEFAULT_LOCALE = 'en'
     
+    # PostgreSQL text search configuration for each of the LANGUAGES
+    FTS_CONFIGS = {'en': 'english', 'fr': 'french'}
+    
     # Flask-WTF
     WTF_CSRF_ENABLED = True
     
+    # Uploads (bulk imports are streamed, larger files are spooled to disk).
+    # /import runs within the request, so both limits keep an import well
+    # inside the gunicorn timeout; larger histories go through 'flask import'
+    MAX_CONTENT_LENGTH = 8 * 1024 * 1024
+    IMPORT_MAX_ROWS = 20000
+    
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=1)
 
@@ -44,6 +82,9 @@ class TestingConfig(Config):
     DB_PORT = os.environ.get('DB_PORT', 5432)
     SQLALCHEMY_DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # fast hashing for tests
+    LOGIN_THROTTLE_ENABLED = False
+    WRITE_BEHIND_INTERVAL = 0
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -0,0 +1,71 @@
+"""Gunicorn settings for serving NurAI in production.
+
+    gunicorn --config gunicorn.conf.py run:app
+
+Everything can be overridden from the environment:
+
+- GUNICORN_WORKER_CLASS: ``gthread`` (default), ``sync`` or ``gevent``
+- WEB_CONCURRENCY: worker processes (default: 2 per CPU, plus one)
+- GUNICORN_THREADS: threads per gthread worker (default 4)
+- GUNICORN_CONNECTIONS: concurrent requests per gevent worker (default 100)
+- GUNICORN_MAX_REQUESTS: requests before a worker is recycled (default 1000)
+- PORT: listening port (default 8080)
+
+The application is loaded once in the master and the workers are forked
+from it (``preload_app``), so they share its memory pages until written.
+Per-process resources (password hashing pool, write-behind thread) are
+started lazily in each worker; database connections are dropped after the
+fork so that no socket is shared between processes.
+"""
+import gc
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Patch before the application is preloaded, so that it only ever sees
+    # the cooperative versions of threading, socket and time
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 100))
+
+preload_app = True
+
+# Recycle workers to bound slow memory growth; the jitter keeps them from
+# restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = 30
+graceful_timeout = 30
+# Longer than the 600 s idle timeout of the Google Cloud load balancer, so
+# it never reuses a connection the worker has just closed
+keepalive = 620
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Move the preloaded objects out of the collector's reach: collections
+    # in the workers would otherwise touch their reference counts and copy
+    # every shared page
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import db
+
+    with server.app.wsgi().app_context():
+        # Connections opened by the master belong to it
+        db.engine.dispose(close=False)
+
+    if worker_class == 'gevent':
+        # Let other greenlets run while psycopg2 waits on the database
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()